@@ -3,13 +3,15 @@ Entry point for 2/4 HNS
 """
 
 import sys
+import signal
 import pathlib
 import logging
 import argparse
 import threading
 
+from hns import metrics, profiler, tracing
 from hns.core import HNS
-from hns.logger import get_component_logger
+from hns.logger import get_component_logger, stop_queue_logging
 
 logger = get_component_logger("main")
 
@@ -19,10 +21,26 @@ logging.basicConfig(level=logging.INFO)
 context = threading.local()
 
 
+def dump_metrics(signum, frame):
+    """Log the metrics of the current process, e.g. on SIGUSR1."""
+    logger.info(metrics.registry.summary())
+
+
 def main(args=sys.argv[1:]):
     """
     Main entry point for the 2/4 HNS control software.
+
+    Use ``replay`` as first argument to replay recorded frames offline
+    or ``sweep`` to sweep the signal detector settings on recorded frames.
     """
+    if args and args[0] == "replay":
+        from hns import replay
+        return replay.main(args[1:])
+
+    if args and args[0] == "sweep":
+        from hns import sweep
+        return sweep.main(args[1:])
+
     parser = argparse.ArgumentParser(description="2/4 HNS Control Software")
     parser.add_argument(
         "configfile", metavar="CONFIG", nargs="?",
@@ -34,14 +52,62 @@ def main(args=sys.argv[1:]):
         "-d", "--debug", action="store_true",
         help="Enable debug mode"
     )
+    parser.add_argument(
+        "--fast-startup", action="store_true",
+        help="Initialize camera, detectors and workers concurrently"
+    )
+    parser.add_argument(
+        "--simulate", action="store_true",
+        help="Run against replayed frames and a simulated drive and crane"
+    )
+    parser.add_argument(
+        "--frames", type=pathlib.Path,
+        default=pathlib.Path(__file__).parent / "../tests/images/track",
+        help="Frame directory or packed frames to replay in simulation mode"
+    )
+    parser.add_argument(
+        "--profile", metavar="DIRECTORY", type=pathlib.Path,
+        help="Sample the stacks of all processes into collapsed stack files in the directory"
+    )
+    parser.add_argument(
+        "--trace", metavar="DIRECTORY", type=pathlib.Path,
+        help="Trace the frames through all processes into trace files in the directory"
+    )
 
-    args = parser.parse_args()
+    args = parser.parse_args(args)
 
     if args.debug:
         logging.basicConfig(level=logging.DEBUG)
 
-    context.hns = HNS(args.configfile, debug=args.debug)
-    context.hns.run()
+    # installed before the worker processes are forked, so that they inherit it:
+    # `kill -USR1 -<pgid>` dumps the metrics of all processes.
+    signal.signal(signal.SIGUSR1, dump_metrics)
+
+    # before the Manager and the workers are forked, so that they profile and trace themselves
+    if args.profile is not None:
+        profiler.start_profiling(args.profile)
+    if args.trace is not None:
+        tracing.start_tracing(args.trace)
+
+    overrides = None
+    if args.simulate:
+        from hns import simulation
+        overrides = simulation.simulation_overrides(args.frames)
+
+    try:
+        context.hns = HNS(
+            args.configfile, debug=args.debug, fast_startup=args.fast_startup,
+            overrides=overrides)
+        if args.simulate:
+            simulation.attach_simulation(context.hns)
+        context.hns.run()
+        if args.simulate:
+            logger.info(simulation.report(context.hns.run_timeline))
+    finally:
+        dump_metrics(None, None)
+        profiler.stop_profiling()
+        tracing.stop_tracing()
+        stop_queue_logging()
 
 
 if __name__ == "__main__":
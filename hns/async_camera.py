@@ -1,24 +1,37 @@
 import threading
 import queue
 import multiprocessing
+from hns import tracing
 from hns.signal_detector import SignalType
+from hns.frame_scheduler import stamp_frames
 
 
 class AsyncCamera:
     """
     Asynchronous camera interface
 
-    An `AsyncCamera` provides two queues:
+    An `AsyncCamera` stamps the frames at capture and provides two queues of `Frame`s:
         1. a `queue.Queue()` to use in the same process
         2. a `multiprocessing.Manager.Queue` to use with a `multiprocessing.Pool`
 
     Args:
         camera: the synchronous camera interface
+        signal_detector: the signal detector to crop the frames with
+        motion_gate (MotionGate): optional gate to skip frames without change
+        speed (callable): returns the current speed in m/s for the motion gate
+        pipeline (Pipeline): optional pipeline to pass the frames to
+            instead of the queue of the process workers
     """
 
-    def __init__(self, camera, signal_detector):
+    def __init__(self, camera, signal_detector, motion_gate=None, speed=None, pipeline=None):
         #: Holds the camera interface
         self.camera = camera
+        #: Holds the optional gate to skip unchanged frames
+        self.motion_gate = motion_gate
+        #: Holds the function returning the current speed
+        self.speed = speed
+        #: Holds the optional pipeline detecting the INFO signal
+        self.pipeline = pipeline
         #: Holds the thread to capture camera frames
         self.capture_frames = threading.Thread(target=self._capture_frames, args=(signal_detector,))
         self.capture_frames.daemon = True
@@ -40,18 +53,33 @@ class AsyncCamera:
         self.capture_frames.join()
 
     def _capture_frames(self, signal_detector):
-        for image in self.camera.stream():
+        for frame in stamp_frames(self.camera.stream()):
             if self.stop_event.is_set():
                 break
 
-            cropped_image = signal_detector.crop_image(
-                image, [SignalType.START_SIGNAL, SignalType.INFO_SIGNAL])
+            with tracing.span("AsyncCamera::capture", frame.seq, capture=True):
+                self._dispatch(frame, signal_detector)
 
-            try:
-                # Needs to be empty to put in the latest frame
-                self.main_thread_queue.get_nowait()
-            except queue.Empty:
-                pass
+    def _dispatch(self, frame, signal_detector):
+        """Pass the cropped frame to the main thread and the workers, unless it's unchanged."""
+        cropped_image = signal_detector.crop_image(
+            frame.image, [SignalType.START_SIGNAL, SignalType.INFO_SIGNAL])
 
-            self.main_thread_queue.put_nowait(cropped_image)
-            self.process_worker_queue.put_nowait(cropped_image)
+        if self.motion_gate is not None and not self.motion_gate.should_process(
+                cropped_image, self.speed() if self.speed is not None else 0.0):
+            # nearly the same as the last frame, neither the main thread nor the workers
+            # would detect anything new on it
+            return
+
+        try:
+            # Needs to be empty to put in the latest frame
+            self.main_thread_queue.get_nowait()
+        except queue.Empty:
+            pass
+
+        cropped_frame = frame._replace(image=cropped_image)
+        self.main_thread_queue.put_nowait(cropped_frame)
+        if self.pipeline is not None:
+            self.pipeline.put(cropped_frame)
+        else:
+            self.process_worker_queue.put_nowait(cropped_frame)
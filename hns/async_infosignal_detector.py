@@ -1,14 +1,25 @@
+import time
 import operator
+import threading
 import multiprocessing
 from collections import defaultdict
 
+from hns import metrics, tracing
 from hns.logger import get_component_logger
 from hns.signal_detector import SignalDetector, SignalType
 from hns.digit_detector import DigitDetector
+from hns.frame_scheduler import FrameScheduler
+from hns.pipeline import Pipeline
 from hns.config import parse_config
 
 logger = get_component_logger("AsyncInfosignalDetector")
 
+#: Holds the detectors of a warmed up worker process
+_worker_detectors = None
+
+#: Holds the exception of a worker process, which failed to initialize
+_worker_error = None
+
 
 class AsyncInfosignalDetector:
     """
@@ -20,21 +31,32 @@ class AsyncInfosignalDetector:
     """
 
     @classmethod
-    def from_config(cls, configfile, config, async_camera):
+    def from_config(cls, configfile, config, async_camera, warm_up=False):
         number_of_workers = config["workers"].getint("number_of_workers")
+        startup_timeout = config["workers"].getfloat("startup_timeout", 60)
         logger.info(
-            "Using AsyncInfosignalDetector settings: number_of_workers=%d",
-            number_of_workers
+            "Using AsyncInfosignalDetector settings: number_of_workers=%d, startup_timeout=%s",
+            number_of_workers, startup_timeout
         )
-        return cls(configfile, config, number_of_workers, async_camera)
+        return cls(
+            configfile, config, number_of_workers, async_camera, warm_up=warm_up,
+            startup_timeout=startup_timeout)
 
-    def __init__(self, configfile, config, number_of_workers, async_camera):
+    def __init__(self, configfile, config, number_of_workers, async_camera, warm_up=False,
+                 startup_timeout=60):
         #: Holds the config
         self.configfile = configfile
         self.config = config
         self.number_of_workers = number_of_workers
-        #: Holds the worker pool
-        self.worker_pool = multiprocessing.Pool(processes=number_of_workers)
+        #: Holds the seconds to wait for the workers to start and initialize
+        self.startup_timeout = startup_timeout
+        #: Holds the worker pool, warmed up workers load their detectors on start
+        if warm_up:
+            self.worker_pool = multiprocessing.Pool(
+                processes=number_of_workers,
+                initializer=init_info_signal_worker, initargs=(configfile,))
+        else:
+            self.worker_pool = multiprocessing.Pool(processes=number_of_workers)
         #: Holds the worker asyncResults
         self.async_results = []
         #: Holds the async camera interface
@@ -42,6 +64,35 @@ class AsyncInfosignalDetector:
         #: Holds the stop event
         self.stop_event = self.async_camera.pool_manager.Event()
 
+    def wait_until_ready(self):
+        """Wait until every worker process is started and initialized.
+
+        Raises:
+            TimeoutError: if the workers aren't ready within the startup timeout
+            Exception: the exception of a worker, which failed to initialize
+        """
+        barrier = self.async_camera.pool_manager.Barrier(self.number_of_workers)
+        results = [
+            self.worker_pool.apply_async(_wait_for_all_workers, (barrier, self.startup_timeout))
+            for _ in range(self.number_of_workers)
+        ]
+        deadline = time.time() + self.startup_timeout
+        errors = []
+        for result in results:
+            try:
+                result.get(max(deadline - time.time(), 0))
+            except multiprocessing.TimeoutError:
+                raise TimeoutError(
+                    "INFO signal workers not ready after {}s".format(self.startup_timeout))
+            except threading.BrokenBarrierError as exc:
+                errors.append(exc)
+            except Exception as exc:
+                # the initializer's exception is raised first, the other workers' aborted waits
+                errors.insert(0, exc)
+        if errors:
+            logger.error("INFO signal workers failed to initialize: '%s'", str(errors[0]))
+            raise errors[0]
+
     def run(self):
         """
         Start the worker processes to detect info signal.
@@ -57,60 +108,140 @@ class AsyncInfosignalDetector:
         self.stop_event.set()
         all_results = []
         for result in self.async_results:
-            all_results.extend(result.get())
+            worker_results, worker_metrics = result.get()
+            all_results.extend(worker_results)
+            metrics.registry.merge(worker_metrics)
         logger.info("Do Majority voting for detected INFO signals: '%s'", str(all_results))
-        return self._majority_vote(all_results)
+        return majority_vote(all_results)
+
+
+class PipelineInfosignalDetector:
+    """
+    INFO signal detection with the stages of the ``[info-pipeline]`` in the config.
+
+    The async camera passes its frames into the pipeline, the digits leaving
+    it are voted on like the `AsyncInfosignalDetector` does.
 
-    def _majority_vote(self, results):
-        votes = defaultdict(int)
-        for digit in results:
-            votes[digit] += 1
-        return max(votes.items(), key=operator.itemgetter(1))[0]
+    Args:
+        config: the config
+        configfile (str, pathlib.Path): path to the config file
+    """
+
+    def __init__(self, config, configfile):
+        #: Holds the digits leaving the pipeline
+        self.results = []
+        #: Holds the pipeline, its worker processes are forked right away
+        self.pipeline = Pipeline.from_config("info", config, configfile, self._collect)
+
+    def wait_until_ready(self):
+        """The worker processes create their steps on start, the pipeline is ready."""
+
+    def run(self):
+        self.pipeline.start()
+
+    def get_result(self):
+        """Stops the pipeline and returns the most detected digit."""
+        self.pipeline.stop()
+        logger.info("Do Majority voting for detected INFO signals: '%s'", str(self.results))
+        return majority_vote(self.results)
+
+    def _collect(self, item):
+        logger.info("Detected INFO signal %d", item["digit"])
+        self.results.append(item["digit"])
+
+
+def majority_vote(results):
+    """The most frequent result."""
+    votes = defaultdict(int)
+    for digit in results:
+        votes[digit] += 1
+    return max(votes.items(), key=operator.itemgetter(1))[0]
+
+
+def _create_detectors(configfile):
+    config = parse_config(configfile, configure_logging=False)
+    signal_detector = SignalDetector.from_config(config["signal-detector"])
+    digit_detector = DigitDetector.from_config(config["digit-detector"])
+    frame_scheduler = FrameScheduler()
+    if config.has_section("scheduler"):
+        frame_scheduler = FrameScheduler.from_config(config["scheduler"])
+    return signal_detector, digit_detector, frame_scheduler
+
+
+def init_info_signal_worker(configfile):
+    """Initialize a worker process by creating the detectors upfront.
+
+    An exception is kept for `_wait_for_all_workers` instead of raised,
+    the pool would respawn the worker over and over otherwise.
+    """
+    global _worker_detectors, _worker_error
+    try:
+        _worker_detectors = _create_detectors(configfile)
+    except Exception as exc:
+        logger.exception("Failed to initialize INFO signal worker: '%s'", str(exc))
+        _worker_error = exc
+
+
+def _wait_for_all_workers(barrier, timeout):
+    if _worker_error is not None:
+        barrier.abort()
+        raise _worker_error
+    barrier.wait(timeout)
 
 
 def detect_info_signal_worker(configfile, camera_queue, stop_event):
     try:
-        config = parse_config(configfile)
-        signal_detector = SignalDetector.from_config(config["signal-detector"])
-        digit_detector = DigitDetector.from_config(config["digit-detector"])
+        if _worker_detectors is not None:
+            signal_detector, digit_detector, frame_scheduler = _worker_detectors
+        else:
+            signal_detector, digit_detector, frame_scheduler = _create_detectors(configfile)
         signals_to_detect = [SignalType.INFO_SIGNAL]
         results = []
+        # only report what's measured in this worker, not what's inherited from the parent
+        metrics.registry.reset()
 
-        print("Start INFO signal detection worker")
+        logger.info("Start INFO signal detection worker")
         while not stop_event.is_set():
             try:
-                image = camera_queue.get(timeout=5)
+                with metrics.registry.timer("AsyncInfosignalDetector::worker queue wait"):
+                    frame = camera_queue.get(timeout=5)
             except:
                 continue
 
+            # the queue keeps every frame, skip the backlog of a slow worker
+            if frame_scheduler.is_stale(frame, "info"):
+                continue
+
             try:
-                signal = signal_detector.detect(image, signal_types=signals_to_detect)
+                with tracing.span("AsyncInfosignalDetector::info detection", frame.seq):
+                    signal = signal_detector.detect(frame.image, signal_types=signals_to_detect)
             except Exception as exc:
                 # print("Error occured during signal detection: '%s'" % str(exc))
                 continue
 
             if signal is None:
+                frame_scheduler.decided(frame, "info")
                 # drop frame because we didn't detect a signal
                 # print("Dropping no signal detected")
                 continue
 
             if signal.type == SignalType.INFO_SIGNAL:
                 try:
-                    digit = digit_detector.detect(signal.image)
+                    with tracing.span("AsyncInfosignalDetector::digit detection", frame.seq):
+                        digit = digit_detector.detect(signal.image)
                 except Exception as exc:
                     # print("Error occured during digit detection: '%s'" % str(exc))
                     continue
+                frame_scheduler.decided(frame, "info")
                 if digit is None:
                     # false alarm, not a signal
                     # print("Dropping frame because no digit in signal detected")
                     continue
-                print("Detected INFO signal", digit)
+                logger.info("Detected INFO signal %d", digit)
                 results.append(digit)
 
-        print("Stopping INFO signal detection worker with result", results)
-        return results
+        logger.info("Stopping INFO signal detection worker with result %s", str(results))
+        return results, metrics.registry.snapshot()
     except Exception as exc:
-        print("Exception: '{}'".format(exc))
-        import traceback
-        traceback.print_exc()
+        logger.exception("Exception: '%s'", str(exc))
         raise
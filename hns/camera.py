@@ -2,6 +2,7 @@
 HNS 2/4 camera interface
 """
 
+import io
 import time
 
 try:
@@ -15,28 +16,51 @@ except ImportError:
 
 
 from hns.logger import get_component_logger
+from hns.models import YUVImage
+from hns.replay_camera import ReplayCamera
 
 logger = get_component_logger("Camera")
 
 
 class Camera:
+    """
+    Camera interface to the PiCamera.
+
+    The camera either captures BGR frames as numpy arrays or
+    YUV frames as `YUVImage`s. The latter skips the BGR conversion
+    on the GPU and the gray scale conversion in the signal detection.
+    """
+    #: Holds the supported capture formats
+    FORMATS = ("bgr", "yuv")
+
     @classmethod
     def from_config(cls, config):
         logger.info(
-            "Using Camera settings: resolution=%s, rotation=%s, shutter_speed=%s, iso=%s",
-            config["resolution"], config["rotation"], config["shutter_speed"], config["iso"]
+            "Using Camera settings: "
+            "resolution=%s, rotation=%s, shutter_speed=%s, iso=%s, format=%s",
+            config["resolution"], config["rotation"], config["shutter_speed"], config["iso"],
+            config.get("format", "bgr")
         )
         resolution = config.get("resolution").split("x")
         rotation = config.getint("rotation")
         shutter_speed = config.getint("shutter_speed")
         iso = config.getint("iso")
-        return cls((int(resolution[0]), int(resolution[1])), rotation, shutter_speed, iso)
+        capture_format = config.get("format", "bgr")
+        return cls(
+            (int(resolution[0]), int(resolution[1])), rotation, shutter_speed, iso,
+            capture_format=capture_format
+        )
+
+    def __init__(self, resolution, rotation, shutter_speed, iso, capture_format="bgr"):
+        if capture_format not in self.FORMATS:
+            raise ValueError("Unsupported camera format '{}', use one of {}".format(
+                capture_format, ", ".join(self.FORMATS)))
 
-    def __init__(self, resolution, rotation, shutter_speed, iso):
         self.__resolution = resolution
         self.__rotation = rotation
         self.__shutter_speed = shutter_speed
         self.__iso = iso
+        self.__format = capture_format
 
         logger.info("Initializing camera ...")
         self._camera = PiCamera()
@@ -44,7 +68,10 @@ class Camera:
         self._camera.rotation = self.__rotation
         self._camera.shutter_speed = self.__shutter_speed
         self._camera.iso = self.__iso
-        self.__raw_capture = PiRGBArray(self._camera, size=self.__resolution)
+        if self.__format == "yuv":
+            self.__raw_capture = io.BytesIO()
+        else:
+            self.__raw_capture = PiRGBArray(self._camera, size=self.__resolution)
         # let camera initialize properly
         time.sleep(2)
         logger.info("Camera initialized")
@@ -52,10 +79,15 @@ class Camera:
     def reset(self):
         """Reset stream"""
         # clear the stream in preparation for the next frame
+        self.__raw_capture.seek(0)
         self.__raw_capture.truncate(0)
 
     def stream(self):
         """Access the camera stream"""
+        if self.__format == "yuv":
+            yield from self._stream_yuv()
+            return
+
         # capture frames from the camera
         for frame in self._camera.capture_continuous(
                 self.__raw_capture, format="bgr", use_video_port=True):
@@ -66,3 +98,28 @@ class Camera:
 
             # clear the stream in preparation for the next frame
             self.__raw_capture.truncate(0)
+
+    def _stream_yuv(self):
+        # capture raw I420 frames, so that neither the GPU nor we have to convert to BGR
+        for stream in self._camera.capture_continuous(
+                self.__raw_capture, format="yuv", use_video_port=True):
+
+            # the planes are views on a copy of the buffer, because the buffer is reused
+            image = YUVImage.from_buffer(stream.getvalue(), self.__resolution)
+            yield image
+
+            # clear the stream in preparation for the next frame
+            self.reset()
+
+
+def camera_from_config(config):
+    """Create the camera interface selected by the ``source`` setting.
+
+    The source is either ``picamera`` for the PiCamera or the
+    path to recorded frames to replay them with a `ReplayCamera`.
+    """
+    source = config.get("source", "picamera")
+    if source == "picamera":
+        return Camera.from_config(config)
+
+    return ReplayCamera.from_config(config)
@@ -2,10 +2,18 @@ import logging.config
 import configparser
 
 
-def parse_config(configfile):
-    """Parse and validate the given config file."""
+def parse_config(configfile, configure_logging=True):
+    """Parse and validate the given config file.
+
+    Args:
+        configfile (str, pathlib.Path): path to the config file
+        configure_logging (bool): apply the logging configuration of the config file.
+            Forked worker processes inherit the logging configuration and must not
+            apply it again, because that would truncate the log files.
+    """
     config = configparser.ConfigParser()
     config.read(str(configfile))
 
-    logging.config.fileConfig(str(configfile))
+    if configure_logging:
+        logging.config.fileConfig(str(configfile))
     return config
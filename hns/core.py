@@ -4,19 +4,27 @@ HNS 2/4 Command and Control Functionalities.
 
 import time
 from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
 
+from hns import metrics, tracing
 from hns.config import parse_config
-from hns.logger import get_component_logger
+from hns.logger import get_component_logger, start_queue_logging
+from hns.utils import Timeline
 
 from hns.uart_communication import UartCommunication
 from hns.crane import Crane
-from hns.camera import Camera
+from hns.camera import camera_from_config
 from hns.signal_detector import SignalDetector, SignalType
+from hns.stop_signal_voter import StopSignalVoter
 from hns.digit_detector import DigitDetector
-from hns.distance_estimator import DistanceEstimator
-from hns.sound_output import SoundOutput
+from hns.distance_estimator import DistanceEstimator, StreamingDistanceEstimator
+from hns.sound_output import sound_output_from_config
 from hns.async_camera import AsyncCamera
-from hns.async_infosignal_detector import AsyncInfosignalDetector
+from hns.motion_gate import MotionGate, skip_ratio
+from hns.async_infosignal_detector import AsyncInfosignalDetector, PipelineInfosignalDetector
+from hns.frame_recorder import FrameRecorder
+from hns.frame_scheduler import FrameScheduler, stamp_frames
+from hns.memory import MemorySampler
 
 logger = get_component_logger("HNS")
 telemetry_logger = get_component_logger("telemetry")
@@ -28,38 +36,56 @@ class HNS:
 
     Args:
         configfile (str, pathlib.Path): path to the config file
+        debug (bool): enable debug mode
+        fast_startup (bool): initialize the camera, the detectors and the workers concurrently
+        overrides (dict): config values overriding the config file, per section
     """
-    def __init__(self, configfile, debug=False):
+    def __init__(self, configfile, debug=False, fast_startup=False, overrides=None):
         self.debug = debug
-        self.config = parse_config(configfile)
+        #: Holds the timeline of the startup phases
+        self.startup_timeline = Timeline()
+        #: Holds the timeline of the events during the run
+        self.run_timeline = None
+        with self.startup_timeline.phase("config"):
+            self.config = parse_config(configfile)
+            if overrides is not None:
+                self.config.read_dict(overrides)
+        if self.config.has_section("log-queue") \
+                and self.config["log-queue"].getboolean("enabled", False):
+            # before the workers are forked, so that they log through the queue, too
+            start_queue_logging()
         self.wheel_revolutions = 0
         logger.info("Created HNS from config %s", configfile)
 
         #: Holds configuration for the drive
         self._full_speed = self.config["drive"].getint("full_speed")
         self._stop_speed = self.config["drive"].getint("stop_speed")
+        self._continuous_stop = self.config["drive"].getboolean("continuous_stop", False)
+        self._resnap_timeout = self.config["drive"].getfloat("resnap_timeout", 5)
 
-        #: Holds the camera interface
-        self.camera = Camera.from_config(self.config["camera"])
-
-        #: Holds the Signal Detector to detect Info- and Stop-Signals
-        self.signal_detector = SignalDetector.from_config(
-            self.config["signal-detector"])
-
-        #: Holds the async camera interface
-        self.async_camera = AsyncCamera(self.camera, self.signal_detector)
+        if fast_startup:
+            pending_initialization = self._initialize_concurrently(configfile)
+        else:
+            self._initialize_sequentially(configfile)
 
-        #: Holds the async infosignal detector
-        self.async_infosignal_detector = AsyncInfosignalDetector.from_config(
-            configfile, self.config, self.async_camera)
-
-        #: Holds the Digit Detector
-        self.digit_detector = DigitDetector.from_config(
-            self.config["digit-detector"])
+        #: Holds the scheduler to drop frames exceeding the latency budget of a phase
+        self.frame_scheduler = FrameScheduler()
+        if self.config.has_section("scheduler"):
+            self.frame_scheduler = FrameScheduler.from_config(self.config["scheduler"])
 
         #: Holds the Distance Estimator to estimate distance to Stop-Signals
         self.distance_estimator = DistanceEstimator()
 
+        #: Holds the Distance Estimator fusing the estimates with the odometry
+        self.streaming_distance_estimator = None
+        if self._continuous_stop:
+            self.streaming_distance_estimator = StreamingDistanceEstimator.from_config(
+                self.distance_estimator, self.config["distance-estimator"])
+            self._max_distance_uncertainty = self.config["distance-estimator"].getfloat(
+                "max_uncertainty")
+            self._max_frames_without_signal = self.config["distance-estimator"].getint(
+                "max_frames_without_signal", 5)
+
         #: Holds the Crane instance
         self.crane = Crane()
 
@@ -68,7 +94,129 @@ class HNS:
         self.comm.register_status_updated_handler(self._status_updated)
 
         #: Holds the sound output actor
-        self.sound = SoundOutput.from_config(self.config["sound"])
+        self.sound = sound_output_from_config(self.config["sound"])
+
+        #: Holds the optional frame recorder
+        self.recorder = None
+        self._recorded_frames = 0
+        if self.config.has_section("recorder") \
+                and self.config["recorder"].getboolean("enabled", False):
+            self.recorder = FrameRecorder.from_config(self.config["recorder"])
+
+        #: Holds the optional sampler of the memory of all processes
+        self.memory_sampler = None
+        if self.config.has_section("memory") \
+                and self.config["memory"].getboolean("enabled", False):
+            self.memory_sampler = MemorySampler.from_config(self.config["memory"])
+
+        if fast_startup:
+            pending_initialization()
+
+        logger.info(
+            "HNS ready after %.3fs, startup timeline:\n%s",
+            self.startup_timeline.elapsed(), self.startup_timeline.format())
+
+    def _initialize_sequentially(self, configfile):
+        """Initialize the camera, the detectors and the worker pool one after another."""
+        #: Holds the camera interface
+        with self.startup_timeline.phase("camera warm-up"):
+            self.camera = camera_from_config(self.config["camera"])
+
+        #: Holds the Signal Detector to detect Info- and Stop-Signals
+        with self.startup_timeline.phase("signal detector"):
+            self.signal_detector = SignalDetector.from_config(
+                self.config["signal-detector"])
+
+        with self.startup_timeline.phase("worker pool"):
+            #: Holds the async camera interface and the async infosignal detector
+            self.async_camera, self.async_infosignal_detector = \
+                self._create_info_signal_detection(configfile, self.camera)
+
+        #: Holds the Digit Detector
+        with self.startup_timeline.phase("digit detector"):
+            self.digit_detector = DigitDetector.from_config(
+                self.config["digit-detector"])
+
+    def _initialize_concurrently(self, configfile):
+        """Initialize the camera, the detectors and the worker pool concurrently.
+
+        The worker processes are forked first, before any thread is started
+        and before tensorflow is loaded. Then they load their detectors while
+        the camera warms up and the digit detector is loaded in threads.
+
+        Returns:
+            callable: to wait until everything is initialized
+        """
+        timeline = self.startup_timeline
+
+        with timeline.phase("signal detector"):
+            self.signal_detector = SignalDetector.from_config(
+                self.config["signal-detector"])
+
+        with timeline.phase("worker pool"):
+            # the camera is attached as soon as it's warmed up
+            self.async_camera, self.async_infosignal_detector = \
+                self._create_info_signal_detection(configfile, None, warm_up=True)
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        camera = executor.submit(
+            timeline.timed("camera warm-up", camera_from_config), self.config["camera"])
+        digit_detector = executor.submit(
+            timeline.timed("digit detector", DigitDetector.from_config),
+            self.config["digit-detector"])
+
+        def wait_until_initialized():
+            self.camera = camera.result()
+            self.async_camera.camera = self.camera
+            self.digit_detector = digit_detector.result()
+            with timeline.phase("worker warm-up"):
+                self.async_infosignal_detector.wait_until_ready()
+            executor.shutdown()
+
+        return wait_until_initialized
+
+    def _create_info_signal_detection(self, configfile, camera, warm_up=False):
+        """The async camera and the detection of the INFO signal on its frames.
+
+        The INFO signal is detected by the ``[info-pipeline]`` if it's enabled,
+        otherwise by the workers of the `AsyncInfosignalDetector`.
+        """
+        if self.config.has_section("info-pipeline") \
+                and self.config["info-pipeline"].getboolean("enabled", False):
+            # the worker processes of the pipeline are forked before the Manager
+            detector = PipelineInfosignalDetector(self.config, configfile)
+            async_camera = AsyncCamera(
+                camera, self.signal_detector, pipeline=detector.pipeline,
+                **self._motion_gate_from_config())
+            return async_camera, detector
+
+        async_camera = AsyncCamera(camera, self.signal_detector, **self._motion_gate_from_config())
+        detector = AsyncInfosignalDetector.from_config(
+            configfile, self.config, async_camera, warm_up=warm_up)
+        return async_camera, detector
+
+    def _motion_gate_from_config(self):
+        """The optional motion gate of the async camera and the speed to scale it with."""
+        if not self.config.has_section("motion-gate") \
+                or not self.config["motion-gate"].getboolean("enabled", False):
+            return {}
+        # NOTE: the UART communication is created later, but only queried while driving
+        return {
+            "motion_gate": MotionGate.from_config(self.config["motion-gate"]),
+            "speed": lambda: self.comm.get_status()["current speed"],
+        }
+
+    def _stop_signal_voter(self, stop_signal_number):
+        """The voter to decide when to stop at the given STOP signal."""
+        if self.config.has_section("stop-voter"):
+            return StopSignalVoter.from_config(stop_signal_number, self.config["stop-voter"])
+        # without voting, decide on the first frame with the arg max of the digit detector
+        return StopSignalVoter(stop_signal_number, window=1, threshold=1, hard=True)
+
+    def _mark_stop_signal_sighting(self, digit, stop_signal_number, frame):
+        """Mark the first frame with the STOP signal to stop at on the run timeline."""
+        if digit == stop_signal_number and self.run_timeline.get("stop signal sighted") is None:
+            self.run_timeline.mark("stop signal sighted", ago=time.time() - frame.timestamp)
 
     def _status_updated(self, current_status):
         self.wheel_revolutions = current_status['wheel cycles']
@@ -79,9 +227,31 @@ class HNS:
 
         telemetry_logger.info("status {0} %".format(current_status))
 
+    def _record(self, image, signal, digit, frame_starttime):
+        """Pass a processed frame to the frame recorder, if recording is enabled."""
+        if self.recorder is None:
+            return
+
+        self._recorded_frames += 1
+        self.recorder.record(
+            self._recorded_frames, image,
+            image if signal is None else signal.image,
+            "none" if signal is None else signal.type,
+            digit,
+            time.time() - frame_starttime
+        )
+
     def run(self):
         """Run the main loop of the control software."""
         logger.info("Starting HNS main loop")
+        self.run_timeline = Timeline()
+
+        if self.memory_sampler is not None:
+            # after the startup, so that the Manager and the workers are sampled, too
+            self.memory_sampler.start()
+
+        if self.recorder is not None:
+            self.recorder.start()
 
         logger.info("Starting async INFO signal detectors")
         self.async_infosignal_detector.run()
@@ -93,17 +263,25 @@ class HNS:
         logger.info("Wait until the Crane picks up the cube ...")
         self.crane.wait_for_cube()
         logger.info("Cube seems to be loaded")
+        self.run_timeline.mark("cube picked")
 
         signal_to_stop = self._speed_laps()
         self._drive_until_stop_signal(signal_to_stop)
 
         time.sleep(10)
-        self.sound._buzz(3000, 1)
+        self.sound.buzz(3000, 1)
+        self.sound.wait()
 
         logger.info("Stopping UART communication")
         self.comm.stop()
         logger.info("Stopped UART communication")
 
+        if self.recorder is not None:
+            self.recorder.stop()
+
+        if self.memory_sampler is not None:
+            self.memory_sampler.stop()
+
         logger.info("Shutdown HNS main loop")
 
     def _speed_laps(self):
@@ -127,15 +305,25 @@ class HNS:
 
         while True:
             try:
-                image = self.async_camera.main_thread_queue.get(timeout=5)
+                with metrics.registry.timer("HNS::main thread queue wait"):
+                    frame = self.async_camera.main_thread_queue.get(timeout=5)
             except:
                 continue
 
+            if self.frame_scheduler.is_stale(frame, "laps"):
+                continue
+
+            frame_starttime = time.time()
+            image = frame.image
             try:
-                signal = self.signal_detector.detect(image, signal_types=signals_to_detect)
+                with tracing.span("HNS::lap detection", frame.seq):
+                    signal = self.signal_detector.detect(image, signal_types=signals_to_detect)
             except Exception as exc:
                 logger.error("Error occured during signal detection: '%s'", str(exc))
                 continue
+            self.frame_scheduler.decided(frame, "laps")
+
+            self._record(image, signal, "START" if signal is not None else 0, frame_starttime)
 
             if signal is None:
                 # drop frame because we didn't detect a signal
@@ -149,14 +337,18 @@ class HNS:
 
             laps += 1
             last_detected_start_signal = time.time()
+            self.run_timeline.mark("lap {}".format(laps))
             logger.info("Increasing Lap count to %d", laps)
             if laps == 3:
                 logger.info("Passed the Start Signal the 3rd time, so now we need to stop")
                 logger.info("Slow down to stopping speed of %d", self._stop_speed)
                 self.comm.set_target_speed(self._stop_speed)
-                signal_to_stop = self.async_infosignal_detector.get_result()
+                with self.run_timeline.phase("INFO vote"):
+                    signal_to_stop = self.async_infosignal_detector.get_result()
                 self.async_camera.stop()
                 logger.info("Voted for STOP signal: %d", signal_to_stop)
+                if self.async_camera.motion_gate is not None:
+                    logger.info("Motion gate skipped %.1f%% of the frames", 100 * skip_ratio())
 
                 sound_thread = Thread(target=self.sound.output_number, args=(signal_to_stop,))
                 sound_thread.daemon = True
@@ -175,36 +367,55 @@ class HNS:
 
         logger.info("Drive until the STOP signal %d is found", stop_signal_number)
 
+        if self._continuous_stop:
+            return self._approach_stop_signal(stop_signal_number)
+
         signal_to_detect = [SignalType.STOP_SIGNAL]
         remaining_distance_until_stop = 0
+        voter = self._stop_signal_voter(stop_signal_number)
 
-        for image in self.camera.stream():
+        for frame in stamp_frames(self.camera.stream()):
+            frame_starttime = time.time()
+            image = frame.image
             try:
-                signal = self.signal_detector.crop_and_detect(image, signal_types=signal_to_detect)
+                # the frames are captured by this thread in the STOP signal phase
+                with tracing.span("HNS::stop detection", frame.seq, capture=True):
+                    signal = self.signal_detector.crop_and_detect(
+                        image, signal_types=signal_to_detect)
             except Exception as exc:
                 logger.error("Error occured during signal detection: '%s'", str(exc))
                 continue
 
             if signal is None:
                 # drop the frame
+                voter.update(None)
+                self._record(image, signal, 0, frame_starttime)
                 logger.debug("Dropping frame because no signal detected")
                 continue
 
             try:
-                digit = self.digit_detector.detect(signal.image)
+                with tracing.span("HNS::stop digit detection", frame.seq):
+                    probabilities = self.digit_detector.predict(signal.image)
             except Exception as exc:
                 logger.error("Error occured during digit detection: '%s'", str(exc))
                 continue
+            digit = int(probabilities.argmax()) or None
+            commit = voter.update(probabilities)
+            self.frame_scheduler.decided(frame, "stop")
+
+            self._record(image, signal, digit or 0, frame_starttime)
             if digit is None:
                 # false alarm, not a signal
-                logger.debug("Dropping frame because no digit in signal detected")
-                continue
-
-            logger.info("Found a Stop Signal with digit: %d", digit)
+                logger.debug("No digit in signal detected")
+            else:
+                logger.info("Found a Stop Signal with digit: %d", digit)
+                self._mark_stop_signal_sighting(digit, stop_signal_number, frame)
 
-            if digit == stop_signal_number:
-                logger.info("Detected correct digit %d to stop and wait until stopped", digit)
+            if commit:
+                logger.info(
+                    "Detected correct digit %d to stop and wait until stopped", stop_signal_number)
                 self.comm.set_target_speed(0)  # stop before a STOP Signal
+                self.run_timeline.mark("stop command")
                 while self.comm.get_status()["current speed"] != 0:
                     logger.debug("wait for approach to complete")
 
@@ -213,14 +424,25 @@ class HNS:
                 break
 
         self.camera.reset()
-        image_stream = self.camera.stream()
-        image = next(image_stream)
+        signal = None
+        deadline = time.time() + self._resnap_timeout
+        for image in self.camera.stream():
+            signal = self.signal_detector.crop_and_detect(
+                image, signal_types=[SignalType.STOP_SIGNAL])
+            if signal is not None or time.time() > deadline:
+                break
+            logger.debug("Stop Signal not in sight after stopping, take another frame")
+
+        if signal is None:
+            logger.error(
+                "Stop Signal not in sight %.1fs after stopping, stay where we are",
+                self._resnap_timeout)
+            return
 
-        signal = self.signal_detector.crop_and_detect(image, signal_types=[SignalType.STOP_SIGNAL])
         distance = self.distance_estimator.estimate(signal.image)
         logger.info(
                 "Found the Stop Signal %d where we need to stop in %fcmd",
-                digit, distance)
+                stop_signal_number, distance)
 
         remaining_distance_until_stop = distance
         logger.info(
@@ -228,5 +450,93 @@ class HNS:
                 remaining_distance_until_stop)
 
         self.comm.set_distance_to_go(remaining_distance_until_stop)
+        self.run_timeline.mark("distance to go")
         time.sleep(1)
         logger.info("Completed stop drive!!")
+
+    def _approach_stop_signal(self, stop_signal_number):
+        """Approach the correct stop signal without stopping in front of it
+
+        As soon as the correct stop signal is found, the remaining distance
+        is estimated continuously while rolling. The distance to go is sent
+        once the estimate is certain enough, or with the current estimate once
+        the signal is out of sight for a few frames or the estimate is reached.
+        """
+        signal_to_detect = [SignalType.STOP_SIGNAL]
+        estimator = self.streaming_distance_estimator
+        estimator.reset()
+        found_stop_signal = False
+        frames_without_signal = 0
+        voter = self._stop_signal_voter(stop_signal_number)
+
+        for frame in stamp_frames(self.camera.stream()):
+            frame_starttime = time.time()
+            image = frame.image
+            try:
+                # the frames are captured by this thread in the STOP signal phase
+                with tracing.span("HNS::stop detection", frame.seq, capture=True):
+                    signal = self.signal_detector.crop_and_detect(
+                        image, signal_types=signal_to_detect)
+            except Exception as exc:
+                logger.error("Error occured during signal detection: '%s'", str(exc))
+                continue
+
+            if not found_stop_signal:
+                if signal is None:
+                    # drop the frame
+                    voter.update(None)
+                    self._record(image, signal, 0, frame_starttime)
+                    logger.debug("Dropping frame because no signal detected")
+                    continue
+
+                try:
+                    with tracing.span("HNS::stop digit detection", frame.seq):
+                        probabilities = self.digit_detector.predict(signal.image)
+                except Exception as exc:
+                    logger.error("Error occured during digit detection: '%s'", str(exc))
+                    continue
+                digit = int(probabilities.argmax()) or None
+
+                self._record(image, signal, digit or 0, frame_starttime)
+                self._mark_stop_signal_sighting(digit, stop_signal_number, frame)
+                if not voter.update(probabilities):
+                    logger.debug("Dropping frame, not enough evidence for digit %d yet", digit or 0)
+                    continue
+
+                logger.info(
+                    "Detected correct digit %d, estimate distance while rolling",
+                    stop_signal_number)
+                found_stop_signal = True
+            else:
+                self._record(image, signal, stop_signal_number, frame_starttime)
+
+            estimate = estimator.update(
+                self.wheel_revolutions, None if signal is None else signal.image)
+            self.frame_scheduler.decided(frame, "stop")
+            telemetry_logger.info(
+                "distance estimate %f mm with variance %f mm^2",
+                estimate.distance, estimate.variance)
+
+            frames_without_signal = 0 if signal is not None else frames_without_signal + 1
+            if estimate.variance ** 0.5 > self._max_distance_uncertainty:
+                # without the signal, the odometry only grows the uncertainty
+                if frames_without_signal >= self._max_frames_without_signal:
+                    logger.warning(
+                        "Stop Signal out of sight for %d frames, stop with the estimate",
+                        frames_without_signal)
+                elif estimate.distance <= 0:
+                    logger.warning("Reached the estimated Stop Signal before it was certain")
+                else:
+                    continue
+
+            logger.info(
+                "We are in distance to stop. Distance remaining: %f +- %f",
+                estimate.distance, estimate.variance ** 0.5)
+            self.comm.set_distance_to_go(max(estimate.distance, 0))
+            self.run_timeline.mark("stop command")
+            self.run_timeline.mark("distance to go")
+            break
+
+        while self.comm.get_status()["current speed"] != 0:
+            logger.debug("wait for approach to complete")
+        logger.info("Completed stop drive!!")
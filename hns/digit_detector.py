@@ -6,10 +6,10 @@ from pathlib import Path
 
 import cv2
 import numpy as np
-from keras.models import load_model
 
 from hns.logger import get_component_logger
 from hns.utils import timeit
+from hns.mmap_digit_model import load_weights
 
 logger = get_component_logger("DigitDetector")
 
@@ -21,15 +21,36 @@ class DigitDetector:
     Args:
         config: the Digit Detector configuration
     """
+    #: Holds the supported backends to run the model with
+    BACKENDS = ("keras", "mmap")
+
     @classmethod
     def from_config(cls, config):
         model_path = Path(__file__).parent / config["model"]
-        logger.info("Using model=%s", model_path)
-        return cls(model_path)
+        backend = config.get("backend", "keras")
+        weights_path = model_path.with_suffix(".weights")
+        if config.get("weights"):
+            weights_path = Path(__file__).parent / config["weights"]
+        logger.info("Using model=%s, backend=%s", model_path, backend)
+        return cls(model_path, backend=backend, weights_path=weights_path)
+
+    def __init__(self, model_path, backend="keras", weights_path=None):
+        if backend not in self.BACKENDS:
+            raise ValueError("Unsupported backend '{}', use one of {}".format(
+                backend, ", ".join(self.BACKENDS)))
 
-    def __init__(self, model_path):
         self.model_path = model_path
 
+        if backend == "mmap":
+            # the weights are shared with all other processes through the page cache
+            self.__model = load_weights(
+                model_path, weights_path or Path(model_path).with_suffix(".weights"))
+            return
+
+        # NOTE: keras (and with it tensorflow) is imported lazily,
+        #       it takes seconds and is not needed before the model is loaded.
+        from keras.models import load_model
+
         # Load trained weights
         self.__model = load_model(str(self.model_path))
 
@@ -40,10 +61,7 @@ class DigitDetector:
         Args:
             image (numpy.array): 1 channel grayscale image
         """
-        image = self._prepare_image(image)
-        vectorized_image = image.reshape(1, 28, 28, 1)
-        predictions = self.__model.predict(vectorized_image)
-        logger.debug("Predicated image possibilities: %s", str(predictions))
+        predictions = self.predict(image)
 
         # choose the digit with greatest possibility as predicted digit
         predicted_digit = np.argmax(predictions)
@@ -54,6 +72,22 @@ class DigitDetector:
         logger.debug("Predicted digit in image: %d", predicted_digit)
         return predicted_digit
 
+    @timeit(logger, "DigitDetector::prediction")
+    def predict(self, image):
+        """Predict the possibilities of all digits in the given image
+
+        Args:
+            image (numpy.array): 1 channel grayscale image
+
+        Returns:
+            numpy.array: the softmax over the digits 0-9, 0 means no digit
+        """
+        image = self._prepare_image(image)
+        vectorized_image = image.reshape(1, 28, 28, 1)
+        predictions = self.__model.predict(vectorized_image)[0]
+        logger.debug("Predicated image possibilities: %s", str(predictions))
+        return predictions
+
     @timeit(logger, "DigitDetector::preprocess image for detection")
     def _prepare_image(self, image):
         scaled_image = cv2.resize(image, (28, 28))
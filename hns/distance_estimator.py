@@ -2,6 +2,8 @@
 Implements functionality to estimate the distances on an image.
 """
 
+from collections import namedtuple
+
 from hns.logger import get_component_logger
 
 logger = get_component_logger("DistanceEstimator")
@@ -21,3 +23,85 @@ class DistanceEstimator:
         """
         height, *_ = cropped_image.shape
         return ((-4.1225) * height) + 372.02 - 32
+
+
+# Type to represent a distance estimate with its uncertainty
+DistanceEstimate = namedtuple("DistanceEstimate", ["distance", "variance"])
+
+
+class StreamingDistanceEstimator:
+    """Continuously estimate the remaining distance to a Stop-Signal.
+
+    A one dimensional Kalman filter fuses the per-frame estimates from
+    the cropped image height with the wheel odometry from the UART status.
+    The odometry moves the estimate forward between frames and increases
+    its uncertainty with the travelled distance, every cropped image
+    corrects the estimate.
+
+    Args:
+        estimator (DistanceEstimator): the estimator for a single cropped image
+        mm_per_wheel_cycle (float): the travelled distance per wheel cycle in mm
+        measurement_noise (float): the variance of a cropped image estimate in mm^2
+        odometry_noise (float): the added variance per travelled mm in mm^2
+    """
+    @classmethod
+    def from_config(cls, estimator, config):
+        logger.info(
+            "Using StreamingDistanceEstimator settings: "
+            "mm_per_wheel_cycle=%s, measurement_noise=%s, odometry_noise=%s",
+            config["mm_per_wheel_cycle"], config["measurement_noise"], config["odometry_noise"]
+        )
+        mm_per_wheel_cycle = config.getfloat("mm_per_wheel_cycle")
+        measurement_noise = config.getfloat("measurement_noise")
+        odometry_noise = config.getfloat("odometry_noise")
+        return cls(estimator, mm_per_wheel_cycle, measurement_noise, odometry_noise)
+
+    def __init__(self, estimator, mm_per_wheel_cycle, measurement_noise, odometry_noise):
+        self.estimator = estimator
+        self.mm_per_wheel_cycle = mm_per_wheel_cycle
+        self.measurement_noise = measurement_noise
+        self.odometry_noise = odometry_noise
+        self.reset()
+
+    def reset(self):
+        """Forget the current estimate, e.g. for a new Stop-Signal."""
+        self.__distance = None
+        self.__variance = None
+        self.__wheel_cycles = None
+
+    @property
+    def estimate(self):
+        """The current estimate or ``None`` if there was no measurement yet."""
+        if self.__distance is None:
+            return None
+        return DistanceEstimate(self.__distance, self.__variance)
+
+    def update(self, wheel_cycles, cropped_image=None):
+        """Update the estimate with the odometry and optionally a cropped image.
+
+        Args:
+            wheel_cycles (float): the wheel cycles from the UART status
+            cropped_image (numpy.array): the cropped Stop-Signal of the current frame
+
+        Returns:
+            DistanceEstimate: the estimate or ``None`` if there was no measurement yet
+        """
+        # predict with the odometry
+        if self.__wheel_cycles is not None and self.__distance is not None:
+            travelled = (wheel_cycles - self.__wheel_cycles) * self.mm_per_wheel_cycle
+            self.__distance -= travelled
+            self.__variance += self.odometry_noise * abs(travelled)
+        self.__wheel_cycles = wheel_cycles
+
+        # correct with the measurement
+        if cropped_image is not None:
+            measured_distance = self.estimator.estimate(cropped_image)
+            if self.__distance is None:
+                self.__distance = measured_distance
+                self.__variance = self.measurement_noise
+            else:
+                gain = self.__variance / (self.__variance + self.measurement_noise)
+                self.__distance += gain * (measured_distance - self.__distance)
+                self.__variance *= 1 - gain
+
+        return self.estimate
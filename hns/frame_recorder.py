@@ -0,0 +1,123 @@
+"""
+HNS 2/4 frame recorder
+
+Records frames together with the detection results for a later analysis.
+The frames are encoded and written on a background thread, so that
+recording never blocks the detection. If the disk cannot keep up,
+frames are dropped and counted instead of piling up in memory.
+"""
+
+import csv
+import time
+import queue
+import threading
+from pathlib import Path
+
+import cv2
+
+from hns.logger import get_component_logger
+from hns.models import YUVImage
+
+logger = get_component_logger("FrameRecorder")
+
+#: Holds the marker to stop the writer thread
+_STOP = object()
+
+
+class FrameRecorder:
+    """
+    Record frames with their detection metadata to a directory.
+
+    The directory contains a ``frame-<id>.jpg`` and a ``frame-<id>-signal.jpg``
+    for every recorded frame and a ``frames.csv`` index with the rows:
+    frame id, detected digit, frame path, signal path, signal type, frame time.
+
+    Args:
+        directory (str, pathlib.Path): the directory to write the frames to
+        queue_size (int): the maximum number of frames waiting to be written
+    """
+    @classmethod
+    def from_config(cls, config):
+        logger.info(
+            "Using FrameRecorder settings: directory=%s, queue_size=%s",
+            config["directory"], config["queue_size"]
+        )
+        directory = Path(config["directory"]) / str(int(time.time()))
+        queue_size = config.getint("queue_size")
+        return cls(directory, queue_size)
+
+    def __init__(self, directory, queue_size=64):
+        self.directory = Path(directory)
+        #: Holds the frames waiting to be written
+        self.queue = queue.Queue(maxsize=queue_size)
+        #: Holds the thread writing the frames
+        self.writer = threading.Thread(target=self._write_frames, name="frame_recorder")
+        self.writer.daemon = True
+        #: Holds the number of frames passed to the recorder
+        self.recorded = 0
+        #: Holds the number of frames dropped because the queue was full
+        self.dropped = 0
+        #: Holds the number of frames written to disk
+        self.written = 0
+
+    def start(self):
+        """Start writing the recorded frames."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.writer.start()
+        logger.info("Recording frames to %s", self.directory)
+
+    def stop(self):
+        """Write the pending frames and stop the recorder."""
+        self.queue.put(_STOP)
+        self.writer.join()
+        logger.info(
+            "Stopped recording: recorded=%d, written=%d, dropped=%d",
+            self.recorded, self.written, self.dropped)
+
+    def record(self, frame_id, frame, signal_image, signal_type, detected, frame_time):
+        """Record a frame without blocking.
+
+        Returns:
+            bool: if the frame was queued, ``False`` if it was dropped
+        """
+        self.recorded += 1
+        try:
+            self.queue.put_nowait(
+                (frame_id, frame, signal_image, signal_type, detected, frame_time))
+        except queue.Full:
+            self.dropped += 1
+            logger.debug("Dropping frame %s, because the recorder cannot keep up", frame_id)
+            return False
+        return True
+
+    def _write_frames(self):
+        csv_path = self.directory / "frames.csv"
+        with open(str(csv_path), "w", newline="") as csvfile:
+            framewriter = csv.writer(
+                csvfile, delimiter=",", quotechar="|", quoting=csv.QUOTE_MINIMAL)
+
+            while True:
+                item = self.queue.get()
+                if item is _STOP:
+                    break
+
+                frame_id, frame, signal_image, signal_type, detected, frame_time = item
+                try:
+                    frame_path = self.directory / "frame-{}.jpg".format(frame_id)
+                    signal_path = self.directory / "frame-{}-signal.jpg".format(frame_id)
+                    cv2.imwrite(str(frame_path), _to_writable_image(frame))
+                    cv2.imwrite(str(signal_path), _to_writable_image(signal_image))
+                    framewriter.writerow([
+                        str(frame_id), str(detected),
+                        str(frame_path), str(signal_path), str(signal_type), str(frame_time)])
+                    # stream the index, so that it's complete up to the last written frame
+                    csvfile.flush()
+                    self.written += 1
+                except Exception as exc:
+                    logger.error("Failed to write frame %s: '%s'", frame_id, str(exc))
+
+
+def _to_writable_image(image):
+    if isinstance(image, YUVImage):
+        return image.to_bgr()
+    return image
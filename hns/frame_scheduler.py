@@ -0,0 +1,72 @@
+"""
+Deadline-aware scheduling of camera frames.
+
+Every frame is stamped with a sequence number and its capture time.
+The `FrameScheduler` knows how old a frame may be in each phase of the run
+and discards frames, which would be acted on too late. The age of the
+frames at decision time is recorded into the metrics registry.
+"""
+
+import time
+import itertools
+
+from hns import metrics
+from hns.logger import get_component_logger
+from hns.models import Frame
+
+logger = get_component_logger("FrameScheduler")
+
+#: Holds the phases of the run, which have a latency budget
+PHASES = ("laps", "info", "stop")
+
+#: Holds the sequence numbers of the frames, unique across all streams of the process
+_sequence = itertools.count()
+
+
+def stamp_frames(stream):
+    """Stamp the images of a camera stream as `Frame`s at capture."""
+    for image in stream:
+        yield Frame(next(_sequence), time.time(), image)
+
+
+class FrameScheduler:
+    """
+    Enforce per-phase latency budgets on frames.
+
+    Args:
+        budgets (dict): the maximum age of a frame in seconds per phase,
+            phases without budget never drop frames
+    """
+    @classmethod
+    def from_config(cls, config):
+        budgets = {}
+        for phase in PHASES:
+            budget = config.getfloat("{}_budget".format(phase), 0)
+            if budget > 0:
+                budgets[phase] = budget
+        logger.info("Using FrameScheduler settings: budgets=%s", str(budgets))
+        return cls(budgets)
+
+    def __init__(self, budgets=None):
+        self.budgets = budgets or {}
+
+    def is_stale(self, frame, phase):
+        """Check if the frame is too old to be processed in the given phase.
+
+        Stale frames are counted as dropped.
+        """
+        budget = self.budgets.get(phase)
+        if budget is None or time.time() - frame.timestamp <= budget:
+            return False
+
+        logger.debug(
+            "Dropping frame %d in phase %s, it's %.3fs old",
+            frame.seq, phase, time.time() - frame.timestamp)
+        metrics.registry.increment("FrameScheduler::{} dropped frames".format(phase))
+        return True
+
+    def decided(self, frame, phase):
+        """Record the age of the frame a decision is based on."""
+        metrics.registry.record(
+            "FrameScheduler::{} frame age at decision".format(phase),
+            int((time.time() - frame.timestamp) * 1e9))
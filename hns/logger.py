@@ -2,14 +2,130 @@
 Module with the logger configuration for the HNS.
 """
 
+import os
+import queue
+import atexit
 import logging
+import logging.handlers
+import multiprocessing
 
 #: Holds the root looger name
 LOGGER_NAME = "hns"
 
 logger = logging.getLogger(LOGGER_NAME)
 
+#: Holds the listeners of the queued log records
+_listeners = []
+
 
 def get_component_logger(name):
     """Return a component specific logger instance."""
     return logging.getLogger(LOGGER_NAME + "." + name)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Queue handler which leaves the formatting to the listener.
+
+    Records of the main process are put into a `queue.Queue`, which is
+    cheaper than a `multiprocessing.Queue`. Records of the forked worker
+    processes are put into the `multiprocessing.Queue`.
+    Only the message is merged with its arguments, so that the record can be pickled.
+    """
+
+    def __init__(self, local_queue, process_queue):
+        super().__init__(local_queue)
+        self.process_queue = process_queue
+        self.pid = os.getpid()
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if os.getpid() == self.pid:
+            self.queue.put_nowait(record)
+        else:
+            self.process_queue.put_nowait(record)
+
+
+class _RoutingHandler(logging.Handler):
+    """Pass the dequeued records to the handlers the HNS loggers had before."""
+
+    def __init__(self, routes):
+        super().__init__()
+        #: Holds the original handlers and propagation per logger name
+        self.routes = routes
+
+    def handle(self, record):
+        name = record.name
+        while True:
+            if name in self.routes:
+                handlers, propagate = self.routes[name]
+                for handler in handlers:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+                if not propagate:
+                    break
+            if not name:
+                break
+            name = name.rpartition(".")[0]
+
+
+class _ForwardingHandler(logging.Handler):
+    """Forward the records of the worker processes to the local queue."""
+
+    def __init__(self, local_queue):
+        super().__init__()
+        self.queue = local_queue
+
+    def handle(self, record):
+        self.queue.put_nowait(record)
+
+
+def start_queue_logging():
+    """Log through a queue to a listener thread doing the formatting and I/O.
+
+    The handlers of all HNS loggers are replaced by a handler putting the records
+    into a queue. Worker processes forked afterwards inherit the handler, their
+    records are forwarded through a `multiprocessing.Queue` to the same listener.
+    """
+    if _listeners:
+        return
+
+    local_queue = queue.Queue(-1)
+    process_queue = multiprocessing.Queue(-1)
+    queue_handler = _QueueHandler(local_queue, process_queue)
+
+    root = logging.getLogger()
+    routes = {"": (list(root.handlers), False)}
+    hns_loggers = [logger] + [
+        logging.getLogger(name) for name in list(logging.Logger.manager.loggerDict)
+        if name.startswith(LOGGER_NAME + ".")
+    ]
+    for hns_logger in hns_loggers:
+        if not hns_logger.handlers:
+            continue
+        routes[hns_logger.name] = (list(hns_logger.handlers), hns_logger.propagate)
+        for handler in list(hns_logger.handlers):
+            hns_logger.removeHandler(handler)
+        hns_logger.addHandler(queue_handler)
+        # the listener takes care of the propagation
+        hns_logger.propagate = False
+
+    # the forwarder is stopped first, so that the listener gets all forwarded records
+    _listeners.append(logging.handlers.QueueListener(
+        process_queue, _ForwardingHandler(local_queue)))
+    _listeners.append(logging.handlers.QueueListener(local_queue, _RoutingHandler(routes)))
+    for listener in _listeners:
+        listener.start()
+    atexit.register(stop_queue_logging)
+
+
+def stop_queue_logging():
+    """Process the pending log records and stop the listeners."""
+    while _listeners:
+        _listeners.pop(0).stop()
@@ -0,0 +1,142 @@
+"""
+Memory instrumentation of the HNS processes.
+
+The `MemorySampler` samples the resident memory of the main process and
+of its child processes, the ``multiprocessing.Manager`` server and the
+INFO signal workers, from ``/proc`` in a background thread into the
+telemetry log. Optionally it traces the Python allocations of the main
+process with ``tracemalloc`` and logs the biggest growth at the end.
+"""
+
+import os
+import threading
+import tracemalloc
+import multiprocessing
+
+from hns.logger import get_component_logger
+
+logger = get_component_logger("MemorySampler")
+telemetry_logger = get_component_logger("telemetry")
+
+#: Holds the fields of ``/proc/<pid>/status`` to sample, all in kB
+FIELDS = ("VmRSS", "RssAnon", "RssFile")
+
+
+def process_memory(pid="self"):
+    """The resident memory of a process in kB, empty if it's gone or there is no ``/proc``."""
+    memory = {}
+    try:
+        with open("/proc/{}/status".format(pid)) as status_file:
+            for line in status_file:
+                name, _, value = line.partition(":")
+                if name in FIELDS:
+                    memory[name] = int(value.split()[0])
+    except (IOError, OSError):
+        pass
+    return memory
+
+
+def hns_processes():
+    """The names and pids of the current process and its child processes."""
+    children = sorted((child.name, child.pid) for child in multiprocessing.active_children())
+    return [("main", os.getpid())] + children
+
+
+def allocation_peak(function, *args, **kwargs):
+    """Call the function and measure the peak of its Python allocations in bytes.
+
+    The allocations of numpy arrays, e.g. the results of OpenCV, are traced, too.
+    ``tracemalloc`` must be tracing already.
+
+    Returns:
+        tuple: the result of the function and the peak of its allocations
+    """
+    # NOTE: clearing the traces resets the peak, `tracemalloc.reset_peak()` needs Python 3.9
+    tracemalloc.clear_traces()
+    result = function(*args, **kwargs)
+    return result, tracemalloc.get_traced_memory()[1]
+
+
+class MemorySampler:
+    """
+    Sample the resident memory of all HNS processes periodically.
+
+    Args:
+        interval (float): the time between two samples in s
+        tracemalloc_frames (int): the number of frames of the traced allocations
+            of the main process, ``0`` disables tracing
+    """
+    @classmethod
+    def from_config(cls, config):
+        logger.info(
+            "Using MemorySampler settings: interval=%s, tracemalloc_frames=%s",
+            config.get("interval", "5.0"), config.get("tracemalloc_frames", "0")
+        )
+        return cls(
+            interval=config.getfloat("interval", 5.0),
+            tracemalloc_frames=config.getint("tracemalloc_frames", 0)
+        )
+
+    def __init__(self, interval=5.0, tracemalloc_frames=0):
+        self.interval = interval
+        self.tracemalloc_frames = tracemalloc_frames
+
+        #: Holds the peak resident memory in kB by process name
+        self.peaks = {}
+        #: Holds the snapshot of the traced allocations at the start
+        self._first_snapshot = None
+        #: Holds the event to stop sampling
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._sample_until_stopped)
+        self._thread.daemon = True
+
+    def start(self):
+        if self.tracemalloc_frames > 0:
+            tracemalloc.start(self.tracemalloc_frames)
+            self._first_snapshot = tracemalloc.take_snapshot()
+        self.sample()
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+        self.sample()
+        logger.info("Peak resident memory:\n%s", "\n".join(
+            "  {}: {} kB".format(name, peak) for name, peak in sorted(self.peaks.items())))
+
+        if self._first_snapshot is not None:
+            logger.info("Biggest growth of the Python allocations in the main process:\n%s",
+                        "\n".join("  {}".format(stat) for stat in self.allocation_growth()))
+            tracemalloc.stop()
+            self._first_snapshot = None
+
+    def allocation_growth(self, limit=10):
+        """The source lines with the biggest growth of their allocations since the start."""
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ])
+        return snapshot.compare_to(self._first_snapshot, "lineno")[:limit]
+
+    def sample(self):
+        """Sample and log the resident memory of all HNS processes once.
+
+        Returns:
+            dict: the sampled memory by process name
+        """
+        samples = {}
+        for name, pid in hns_processes():
+            memory = process_memory(pid)
+            if not memory:
+                continue
+            samples[name] = memory
+            self.peaks[name] = max(self.peaks.get(name, 0), memory["VmRSS"])
+
+        telemetry_logger.info("memory %s", ", ".join(
+            "{} {}".format(name, " ".join(
+                "{}={} kB".format(field, memory[field]) for field in FIELDS if field in memory))
+            for name, memory in sorted(samples.items())))
+        return samples
+
+    def _sample_until_stopped(self):
+        while not self._stop_event.wait(self.interval):
+            self.sample()
@@ -0,0 +1,143 @@
+"""
+Low-overhead metrics for the HNS.
+
+Durations are recorded into histograms with fixed buckets, so recording
+is a bisect and an increment, no matter how many values are recorded.
+Each process has its own registry, the snapshots of the worker
+processes are merged into the registry of the main process.
+"""
+
+import os
+import time
+import bisect
+from contextlib import contextmanager
+
+try:
+    from time import perf_counter_ns
+except ImportError:
+    # NOTE: Python < 3.7 has no nanosecond clock
+    def perf_counter_ns():
+        return int(time.perf_counter() * 1e9)
+
+
+#: Holds the upper bounds of the histogram buckets in ns.
+#: The buckets grow by a factor of sqrt(2) from 1us to ~46s.
+BUCKETS = tuple(int(1000 * 2 ** (i / 2)) for i in range(52))
+
+
+class Histogram:
+    """Histogram of durations in ns with the fixed `BUCKETS`."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for bucket, count in enumerate(other.counts):
+            self.counts[bucket] += count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def percentile(self, percent):
+        """Return the upper bound of the bucket containing the given percentile."""
+        if self.count == 0:
+            return None
+        rank = self.count * percent / 100
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count > 0:
+                upper_bound = BUCKETS[bucket] if bucket < len(BUCKETS) else self.max
+                return min(upper_bound, self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+
+class MetricsRegistry:
+    """
+    Registry of named duration histograms and counters.
+
+    Recording is not synchronized between threads.
+    The GIL keeps it consistent enough for statistics.
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+
+    def record(self, name, duration_ns):
+        """Record a duration in ns into the histogram with the given name."""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.record(duration_ns)
+
+    def increment(self, name, value=1):
+        """Increment the counter with the given name."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def timer(self, name):
+        """Record the duration of the with block."""
+        start = perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(name, perf_counter_ns() - start)
+
+    def reset(self):
+        self.histograms.clear()
+        self.counters.clear()
+
+    def snapshot(self):
+        """Return a picklable snapshot, e.g. to pass it from a worker process."""
+        return {
+            "histograms": dict(self.histograms),
+            "counters": dict(self.counters),
+        }
+
+    def merge(self, snapshot):
+        """Merge a snapshot, e.g. from a worker process, into this registry."""
+        for name, histogram in snapshot["histograms"].items():
+            if name not in self.histograms:
+                self.histograms[name] = Histogram()
+            self.histograms[name].merge(histogram)
+        for name, value in snapshot["counters"].items():
+            self.increment(name, value)
+
+    def summary(self):
+        """Format the percentiles of all histograms and all counters."""
+        lines = ["Metrics of process {}:".format(os.getpid())]
+        for name, histogram in sorted(self.histograms.items()):
+            lines.append(
+                "  {}: count={} p50={:.3f}ms p95={:.3f}ms p99={:.3f}ms "
+                "mean={:.3f}ms max={:.3f}ms".format(
+                    name, histogram.count,
+                    histogram.percentile(50) / 1e6, histogram.percentile(95) / 1e6,
+                    histogram.percentile(99) / 1e6, histogram.mean / 1e6, histogram.max / 1e6))
+        for name, value in sorted(self.counters.items()):
+            lines.append("  {}: {}".format(name, value))
+        return "\n".join(lines)
+
+
+#: Holds the registry of the current process
+registry = MetricsRegistry()
@@ -0,0 +1,200 @@
+"""
+Digit model running on memory-mapped weights.
+
+Every process loading the Keras model holds its own copy of the weights
+and the whole tensorflow runtime. The weights of the model are exported
+once into a flat file, which all processes memory-map read-only, so that
+they share the same pages of the page cache. The forward pass of the
+small CNN is implemented with numpy.
+
+The file starts with a header describing the layers as JSON,
+followed by the float32 weights, each aligned to 64 bytes::
+
+    b"HNSW" | uint32 header length | JSON header | padding | weights ...
+
+The offsets of the weights in the header are relative to the aligned end of the header.
+"""
+
+import os
+import json
+import struct
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+from hns.logger import get_component_logger
+
+logger = get_component_logger("MmapDigitModel")
+
+#: Holds the magic bytes of a weights file
+MAGIC = b"HNSW"
+#: Holds the alignment of the weights in the file in bytes
+ALIGNMENT = 64
+#: Holds the layers supported by the forward pass
+SUPPORTED_LAYERS = ("Conv2D", "MaxPooling2D", "Dropout", "Flatten", "Dense")
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def export_weights(model_path, output):
+    """Export the layers and weights of a Keras ``.h5`` model into a flat weights file.
+
+    The file is written to a temporary file first and then renamed,
+    so that concurrently starting processes never see a partial file.
+    """
+    # NOTE: h5py is installed with keras, it's only needed for the export
+    import h5py
+
+    layers = []
+    arrays = []
+    with h5py.File(str(model_path), "r") as model:
+        config = json.loads(model.attrs["model_config"])
+        # Keras 2.2 stores the layers of a Sequential model as list
+        layer_configs = config["config"]
+        if isinstance(layer_configs, dict):
+            layer_configs = layer_configs["layers"]
+
+        for layer_config in layer_configs:
+            class_name = layer_config["class_name"]
+            if class_name not in SUPPORTED_LAYERS:
+                raise ValueError("Unsupported layer {} in {}".format(class_name, model_path))
+
+            name = layer_config["config"]["name"]
+            layer = {
+                "class_name": class_name,
+                "activation": layer_config["config"].get("activation"),
+                "pool_size": layer_config["config"].get("pool_size"),
+                "weights": [],
+            }
+            group = model["model_weights"][name]
+            if name in group:
+                for weight_name in ("kernel:0", "bias:0"):
+                    array = np.asarray(group[name][weight_name], dtype="<f4")
+                    layer["weights"].append({"shape": list(array.shape)})
+                    arrays.append(array)
+            layers.append(layer)
+
+    # the offsets are relative to the aligned start of the weights after the header
+    offset = 0
+    specs = [spec for layer in layers for spec in layer["weights"]]
+    for spec, array in zip(specs, arrays):
+        spec["offset"] = offset
+        offset = _align(offset + array.nbytes)
+    header = json.dumps({"layers": layers}).encode()
+    data_offset = _align(8 + len(header))
+
+    output = Path(output)
+    handle, temporary = tempfile.mkstemp(dir=str(output.parent), prefix=output.name)
+    with os.fdopen(handle, "wb") as weights_file:
+        weights_file.write(MAGIC + struct.pack("<I", len(header)) + header)
+        for spec, array in zip(specs, arrays):
+            weights_file.seek(data_offset + spec["offset"])
+            weights_file.write(array.tobytes())
+    os.chmod(temporary, 0o644)
+    os.replace(temporary, str(output))
+    logger.info("Exported the weights of %s to %s", model_path, output)
+    return output
+
+
+def load_weights(model_path, weights_path):
+    """Memory-map the weights file, it's exported from the model if missing or stale."""
+    weights_path = Path(weights_path)
+    if not weights_path.exists() \
+            or weights_path.stat().st_mtime < Path(model_path).stat().st_mtime:
+        export_weights(model_path, weights_path)
+    return MmapDigitModel(weights_path)
+
+
+def _conv2d(image, kernel, bias):
+    """Valid 2D convolution of a HxWxC image with a KHxKWxCxN kernel."""
+    kernel_height, kernel_width, channels, filters = kernel.shape
+    height = image.shape[0] - kernel_height + 1
+    width = image.shape[1] - kernel_width + 1
+    strides = image.strides
+    windows = as_strided(
+        image, (height, width, kernel_height, kernel_width, channels),
+        (strides[0], strides[1], strides[0], strides[1], strides[2]))
+    output = windows.reshape(height * width, -1) @ kernel.reshape(-1, filters)
+    output += bias
+    return output.reshape(height, width, filters)
+
+
+def _max_pooling2d(image, pool_size):
+    pool_height, pool_width = pool_size
+    height = image.shape[0] // pool_height
+    width = image.shape[1] // pool_width
+    image = image[:height * pool_height, :width * pool_width]
+    return image.reshape(height, pool_height, width, pool_width, -1).max(axis=(1, 3))
+
+
+def _activate(values, activation):
+    if activation == "relu":
+        return np.maximum(values, 0, out=values)
+    if activation == "softmax":
+        values = np.exp(values - values.max())
+        return values / values.sum()
+    if activation in (None, "linear"):
+        return values
+    raise ValueError("Unsupported activation {}".format(activation))
+
+
+class MmapDigitModel:
+    """
+    Forward pass of the digit CNN on memory-mapped weights.
+
+    Args:
+        path (str, pathlib.Path): the weights file exported by `export_weights`
+    """
+
+    def __init__(self, path):
+        self.path = path
+        #: Holds the read-only memory-mapped weights file
+        self.data = np.memmap(str(path), dtype=np.uint8, mode="r")
+        if bytes(self.data[:4]) != MAGIC:
+            raise ValueError("{} is not a weights file".format(path))
+
+        header_length = struct.unpack("<I", bytes(self.data[4:8]))[0]
+        header = json.loads(bytes(self.data[8:8 + header_length]).decode())
+        data_offset = _align(8 + header_length)
+
+        #: Holds the layers as ``(class name, activation, pool size, weights)``
+        self.layers = []
+        for layer in header["layers"]:
+            weights = [
+                np.ndarray(
+                    spec["shape"], dtype="<f4", buffer=self.data,
+                    offset=data_offset + spec["offset"])
+                for spec in layer["weights"]
+            ]
+            self.layers.append(
+                (layer["class_name"], layer["activation"], layer["pool_size"], weights))
+        logger.info("Memory-mapped the weights of %d layers from %s", len(self.layers), path)
+
+    def predict(self, images):
+        """Predict a batch of images like ``keras.Model.predict``.
+
+        Args:
+            images (numpy.array): the images with shape ``(N, height, width, channels)``
+
+        Returns:
+            numpy.array: the output of the last layer with shape ``(N, classes)``
+        """
+        return np.stack([self._forward(image) for image in images])
+
+    def _forward(self, image):
+        values = np.ascontiguousarray(image, dtype=np.float32)
+        for class_name, activation, pool_size, weights in self.layers:
+            if class_name == "Conv2D":
+                values = _activate(_conv2d(values, *weights), activation)
+            elif class_name == "MaxPooling2D":
+                values = _max_pooling2d(values, pool_size)
+            elif class_name == "Flatten":
+                values = values.reshape(-1)
+            elif class_name == "Dense":
+                values = _activate(values @ weights[0] + weights[1], activation)
+            # Dropout is only active during training
+        return values
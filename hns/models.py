@@ -1,7 +1,114 @@
 from enum import Enum
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+
+#: Type to represent a camera frame, stamped with its sequence number and capture time
+Frame = namedtuple("Frame", ["seq", "timestamp", "image"])
 
 
 class SignalType(Enum):
     STOP_SIGNAL = 1
     INFO_SIGNAL = 2
     START_SIGNAL = 3
+
+
+class YUVImage:
+    """
+    Planar YUV 4:2:0 image as captured by the camera in the ``yuv`` format.
+
+    The luma plane is kept in full resolution and is used as the gray image
+    for the edge detection. The chroma planes are kept in half resolution
+    and are only converted to BGR on demand, e.g. for the start signal band.
+
+    Slicing works like on a numpy image, so the existing crop code
+    can be used on both, BGR and YUV images.
+
+    Args:
+        y (numpy.array): the luma plane
+        u (numpy.array): the U chroma plane in half resolution
+        v (numpy.array): the V chroma plane in half resolution
+    """
+    @classmethod
+    def from_buffer(cls, buffer, resolution):
+        """Create a YUV image from a raw I420 buffer of the camera.
+
+        The camera pads the width to a multiple of 32 and
+        the height to a multiple of 16 pixels.
+        """
+        width, height = resolution
+        padded_width = (width + 31) // 32 * 32
+        padded_height = (height + 15) // 16 * 16
+        data = np.frombuffer(buffer, dtype=np.uint8)
+
+        y_size = padded_width * padded_height
+        uv_size = y_size // 4
+        y = data[:y_size].reshape((padded_height, padded_width))
+        u = data[y_size:y_size + uv_size].reshape((padded_height // 2, padded_width // 2))
+        v = data[y_size + uv_size:y_size + 2 * uv_size].reshape(
+            (padded_height // 2, padded_width // 2))
+        return cls(
+            y[:height, :width],
+            u[:height // 2, :width // 2],
+            v[:height // 2, :width // 2]
+        )
+
+    @classmethod
+    def from_bgr(cls, image):
+        """Create a YUV image from a BGR image, e.g. from recorded frames.
+
+        The camera uses full range BT.601 (JFIF), which is what OpenCV calls YCrCb.
+        """
+        height, width = image.shape[:2]
+        y, v, u = cv2.split(cv2.cvtColor(image, cv2.COLOR_BGR2YCrCb))
+        half_size = (width // 2, height // 2)
+        return cls(
+            y,
+            cv2.resize(u, half_size, interpolation=cv2.INTER_AREA),
+            cv2.resize(v, half_size, interpolation=cv2.INTER_AREA)
+        )
+
+    def to_i420(self):
+        """Return the raw I420 buffer like the camera delivers it."""
+        return b"".join(plane.tobytes() for plane in (self.y, self.u, self.v))
+
+    def __init__(self, y, u, v):
+        self.y = y
+        self.u = u
+        self.v = v
+
+    @property
+    def shape(self):
+        return self.y.shape
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+        rows, cols = key
+        return YUVImage(
+            self.y[rows, cols],
+            self.u[_chroma_slice(rows, self.y.shape[0]), _chroma_slice(cols, self.y.shape[1])],
+            self.v[_chroma_slice(rows, self.y.shape[0]), _chroma_slice(cols, self.y.shape[1])]
+        )
+
+    def to_gray(self):
+        """Return the luma plane as gray image without any conversion."""
+        return self.y
+
+    def to_bgr(self):
+        """Convert the image to a 3 channel BGR image."""
+        height, width = self.y.shape
+        u = cv2.resize(self.u, (width, height), interpolation=cv2.INTER_NEAREST)
+        v = cv2.resize(self.v, (width, height), interpolation=cv2.INTER_NEAREST)
+        # merging a contiguous luma plane is a lot faster than merging a strided view
+        y = np.ascontiguousarray(self.y)
+        return cv2.cvtColor(cv2.merge([y, v, u]), cv2.COLOR_YCrCb2BGR)
+
+
+def _chroma_slice(luma_slice, length):
+    start, stop, step = luma_slice.indices(length)
+    if step != 1:
+        raise ValueError("YUVImage only supports contiguous slices")
+    return slice(start // 2, (stop + 1) // 2)
@@ -0,0 +1,108 @@
+"""
+Skip frames which did not change since the last processed frame.
+
+At standstill and in slow sections consecutive frames are nearly identical.
+The `MotionGate` compares a heavily downsampled luma image of every frame
+against the last processed frame, which is a lot cheaper than the signal
+detection. The faster the car drives, the lower the threshold, so that
+at full speed almost no frame is skipped.
+"""
+
+import cv2
+import numpy as np
+
+from hns import metrics
+from hns.logger import get_component_logger
+from hns.models import YUVImage
+
+logger = get_component_logger("MotionGate")
+
+
+class MotionGate:
+    """
+    Gate frames by their change against the last processed frame.
+
+    Args:
+        threshold (float): the mean absolute luma difference at standstill to process a frame
+        reference_speed (float): the speed in m/s at which the threshold is halved
+        downsample (int): the factor to downsample the frames by in both dimensions
+        max_skipped (int): the maximum number of consecutive skipped frames
+    """
+    @classmethod
+    def from_config(cls, config):
+        logger.info(
+            "Using MotionGate settings: threshold=%s, reference_speed=%s, "
+            "downsample=%s, max_skipped=%s",
+            config.get("threshold", "1"), config.get("reference_speed", "0.25"),
+            config.get("downsample", "8"), config.get("max_skipped", "15")
+        )
+        return cls(
+            threshold=config.getfloat("threshold", 1),
+            reference_speed=config.getfloat("reference_speed", 0.25),
+            downsample=config.getint("downsample", 8),
+            max_skipped=config.getint("max_skipped", 15)
+        )
+
+    def __init__(self, threshold=1, reference_speed=0.25, downsample=8, max_skipped=15):
+        self.threshold = threshold
+        self.reference_speed = reference_speed
+        self.downsample = downsample
+        self.max_skipped = max_skipped
+
+        #: Holds the downsampled luma of the last processed frame
+        self.__last_processed = None
+        #: Holds the number of frames skipped since the last processed frame
+        self.__skipped = 0
+
+    def reset(self):
+        """Forget the last processed frame, the next frame is processed."""
+        self.__last_processed = None
+        self.__skipped = 0
+
+    def threshold_at(self, speed):
+        """The threshold at the given speed in m/s."""
+        return self.threshold / (1 + max(speed, 0) / self.reference_speed)
+
+    def _luma(self, image):
+        if isinstance(image, YUVImage):
+            image = image.y
+        height, width = image.shape[:2]
+        small = cv2.resize(
+            image, (max(width // self.downsample, 1), max(height // self.downsample, 1)),
+            interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small
+
+    def should_process(self, image, speed=0.0):
+        """Check if the image changed enough to be processed at the given speed in m/s.
+
+        The image becomes the reference for the next frames if it is processed.
+        """
+        with metrics.registry.timer("MotionGate::frame difference"):
+            luma = self._luma(image)
+            if self.__last_processed is None or luma.shape != self.__last_processed.shape \
+                    or self.__skipped >= self.max_skipped:
+                process = True
+            else:
+                change = float(np.mean(cv2.absdiff(luma, self.__last_processed)))
+                process = change >= self.threshold_at(speed)
+
+        if process:
+            self.__last_processed = luma
+            self.__skipped = 0
+            metrics.registry.increment("MotionGate::processed frames")
+        else:
+            self.__skipped += 1
+            metrics.registry.increment("MotionGate::skipped frames")
+        return process
+
+
+def skip_ratio(snapshot=None):
+    """The ratio of skipped frames in the given metrics snapshot or the global registry."""
+    counters = metrics.registry.counters if snapshot is None else snapshot["counters"]
+    skipped = counters.get("MotionGate::skipped frames", 0)
+    processed = counters.get("MotionGate::processed frames", 0)
+    if skipped + processed == 0:
+        return 0.0
+    return skipped / (skipped + processed)
@@ -0,0 +1,399 @@
+"""
+Declarative pipelines of detection stages.
+
+A pipeline passes frames through a chain of stages. Each stage runs a
+list of steps, like cropping the frame or detecting a signal on it, on
+one of the executors:
+
+* ``inline``: in the thread passing the frame, e.g. a thread of the previous stage
+* ``thread``: in a pool of threads of the main process
+* ``process``: in a pool of worker processes
+
+Stages with a thread or process executor have a bounded input queue,
+its drop policy decides what happens to a frame if it's full: ``block``
+until there is space, drop the ``oldest`` queued frame or drop the
+``newest`` frame. A step returns ``None`` to drop the frame, e.g. if
+there is no signal on it. The frames leaving the last stage are passed
+to the sink of the pipeline. The frames are passed as dicts of the
+`Frame` fields, the steps add their results, like the ``digit``.
+
+The pipelines are declared in the config, each stage in its own section::
+
+    [info-pipeline]
+    stages = detection
+
+    [info-pipeline:detection]
+    steps = info-signal, digit
+    executor = process
+    workers = 2
+    queue_size = 4
+    drop = oldest
+
+The items going in and out and the dropped items of every stage are counted
+in the metrics registry, `Pipeline.throughput` turns them into frames/sec.
+
+A pipeline named like a phase of the `FrameScheduler`, e.g. the ``info``
+pipeline, enforces its latency budget of the ``[scheduler]`` like the INFO
+signal workers: every stage drops the stale frames before running its steps,
+and the age of a frame is recorded once it's decided on, i.e. a step dropped
+it or it left the last stage.
+"""
+
+import time
+import queue
+import threading
+import multiprocessing
+
+from hns import metrics, tracing
+from hns.config import parse_config
+from hns.logger import get_component_logger
+from hns.models import Frame, SignalType
+from hns.frame_scheduler import PHASES, FrameScheduler
+from hns.signal_detector import SignalDetector
+from hns.digit_detector import DigitDetector
+
+logger = get_component_logger("Pipeline")
+
+#: Holds the supported executors of a stage
+EXECUTORS = ("inline", "thread", "process")
+#: Holds the supported drop policies of a full input queue
+DROP_POLICIES = ("block", "oldest", "newest")
+
+#: Holds the steps of a process stage in a worker process
+_process_steps = None
+
+
+def _crop_step(upper):
+    def create(config):
+        # like `SignalDetector.crop_image`: START and INFO signals are in the upper half
+        def crop(item):
+            height = item["image"].shape[0]
+            item["image"] = item["image"][:height // 2] if upper else item["image"][height // 2:]
+            return item
+        return crop
+    return create
+
+
+def _signal_step(signal_type):
+    def create(config):
+        signal_detector = SignalDetector.from_config(config["signal-detector"])
+
+        def detect_signal(item):
+            signal = signal_detector.detect(item["image"], signal_types=[signal_type])
+            if signal is None:
+                return None
+            item["signal"] = signal.type
+            if signal.type != SignalType.START_SIGNAL:
+                # the digit is classified on the cropped number
+                item["image"] = signal.image
+            return item
+        return detect_signal
+    return create
+
+
+def _digit_step(config):
+    digit_detector = DigitDetector.from_config(config["digit-detector"])
+
+    def classify_digit(item):
+        digit = digit_detector.detect(item["image"])
+        if digit is None:
+            return None
+        item["digit"] = int(digit)
+        return item
+    return classify_digit
+
+
+#: Holds the factories of the steps by name, each creates the step from the config
+STEPS = {
+    "crop-upper": _crop_step(upper=True),
+    "crop-lower": _crop_step(upper=False),
+    "start-signal": _signal_step(SignalType.START_SIGNAL),
+    "info-signal": _signal_step(SignalType.INFO_SIGNAL),
+    "stop-signal": _signal_step(SignalType.STOP_SIGNAL),
+    "digit": _digit_step,
+}
+
+
+def create_steps(names, config):
+    return [STEPS[name](config) for name in names]
+
+
+def _run_steps(steps, item):
+    for step in steps:
+        item = step(item)
+        if item is None:
+            return None
+    return item
+
+
+def _init_process_stage(configfile, step_names):
+    """Initialize a worker process of a process stage by creating its steps."""
+    global _process_steps
+    config = parse_config(configfile, configure_logging=False)
+    _process_steps = create_steps(step_names, config)
+
+
+def _run_process_steps(item):
+    return _run_steps(_process_steps, item)
+
+
+def _frame(item):
+    return Frame(item["seq"], item["timestamp"], item["image"])
+
+
+def _split(value):
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
+class Stage:
+    """
+    A stage of a pipeline running its steps on an executor.
+
+    Args:
+        name (str): the name of the stage in the metrics
+        steps (list): the names of the steps in `STEPS`
+        config: the config to create the steps from
+        configfile (str, pathlib.Path): path to the config file,
+            the worker processes of a process executor create their steps from it
+        executor (str): one of the `EXECUTORS`
+        workers (int): the number of threads or processes of the executor
+        queue_size (int): the size of the input queue of a thread or process executor
+        drop (str): one of the `DROP_POLICIES` for a full input queue
+    """
+    @classmethod
+    def from_config(cls, name, config, configfile, section):
+        logger.info(
+            "Using stage %s settings: steps=%s, executor=%s, workers=%s, queue_size=%s, drop=%s",
+            name, section["steps"], section.get("executor", "inline"),
+            section.get("workers", "1"), section.get("queue_size", "1"),
+            section.get("drop", "block")
+        )
+        return cls(
+            name, _split(section["steps"]), config, configfile,
+            executor=section.get("executor", "inline"),
+            workers=section.getint("workers", 1),
+            queue_size=section.getint("queue_size", 1),
+            drop=section.get("drop", "block")
+        )
+
+    def __init__(self, name, steps, config, configfile=None, executor="inline",
+                 workers=1, queue_size=1, drop="block"):
+        unknown_steps = [step for step in steps if step not in STEPS]
+        if unknown_steps:
+            raise ValueError("Unknown steps {} in stage {}, use one of {}".format(
+                ", ".join(unknown_steps), name, ", ".join(sorted(STEPS))))
+        if executor not in EXECUTORS:
+            raise ValueError("Unknown executor '{}' of stage {}, use one of {}".format(
+                executor, name, ", ".join(EXECUTORS)))
+        if drop not in DROP_POLICIES:
+            raise ValueError("Unknown drop policy '{}' of stage {}, use one of {}".format(
+                drop, name, ", ".join(DROP_POLICIES)))
+
+        self.name = name
+        self.steps = steps
+        self.config = config
+        self.executor = executor
+        self.workers = workers
+        self.drop = drop
+        #: Holds the function to pass the items leaving this stage to
+        self.next = None
+        #: Holds the optional scheduler dropping stale frames, set by the pipeline
+        self.scheduler = None
+        #: Holds the phase of the scheduler, the name of the pipeline
+        self.phase = None
+
+        #: Holds the steps of the threads running them, the steps are not thread-safe
+        self._local = threading.local()
+        #: Holds the input queue of a thread or process executor
+        self._queue = None if executor == "inline" else queue.Queue(maxsize=queue_size)
+        #: Holds the threads taking the items from the input queue
+        self._threads = []
+        self._stop_event = threading.Event()
+        #: Holds the worker processes of a process executor
+        self._pool = None
+        if executor == "process":
+            # NOTE: forked on creation, before any thread of the pipeline is started
+            self._pool = multiprocessing.Pool(
+                processes=workers, initializer=_init_process_stage,
+                initargs=(str(configfile), steps))
+
+    def start(self):
+        if self._queue is None:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._take_items, name="{}-{}".format(self.name, index))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Stop the stage, the items still queued are dropped."""
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join()
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+
+    def drain(self):
+        """Wait until every queued item is processed."""
+        if self._queue is not None:
+            self._queue.join()
+
+    def put(self, item):
+        """Pass an item into the stage, the drop policy applies if its input queue is full."""
+        metrics.registry.increment("Pipeline::{} input items".format(self.name))
+        if self._stop_event.is_set():
+            # e.g. the camera is still capturing, nothing would take the item from the queue
+            metrics.registry.increment("Pipeline::{} dropped items".format(self.name))
+            return
+
+        if self._queue is None:
+            self._process(item)
+            return
+
+        if self.drop == "block":
+            self._queue.put(item)
+            return
+
+        try:
+            self._queue.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+
+        if self.drop == "oldest":
+            try:
+                self._queue.get_nowait()
+                self._queue.task_done()
+                self._queue.put_nowait(item)
+            except (queue.Empty, queue.Full):
+                # raced with a thread of this stage or another thread putting items
+                pass
+        metrics.registry.increment("Pipeline::{} dropped items".format(self.name))
+
+    def _take_items(self):
+        while not self._stop_event.is_set():
+            try:
+                item = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                self._process(item)
+            finally:
+                self._queue.task_done()
+
+    def _process(self, item):
+        seq = item.get("seq")
+        frame = None
+        if self.scheduler is not None:
+            frame = _frame(item)
+            # the queues keep frames, skip the backlog of a slow stage
+            if self.scheduler.is_stale(frame, self.phase):
+                return
+
+        try:
+            with metrics.registry.timer("Pipeline::{}".format(self.name)), \
+                    tracing.span("Pipeline::{}".format(self.name), seq):
+                if self._pool is not None:
+                    item = self._pool.apply(_run_process_steps, (item,))
+                else:
+                    item = _run_steps(self._thread_steps(), item)
+        except Exception as exc:
+            logger.exception("Error in stage %s on frame %s: '%s'", self.name, seq, str(exc))
+            metrics.registry.increment("Pipeline::{} failed items".format(self.name))
+            return
+
+        if item is None:
+            if frame is not None:
+                # e.g. there is no signal or no digit on the frame
+                self.scheduler.decided(frame, self.phase)
+            return
+        metrics.registry.increment("Pipeline::{} output items".format(self.name))
+        self.next(item)
+
+    def _thread_steps(self):
+        steps = getattr(self._local, "steps", None)
+        if steps is None:
+            steps = self._local.steps = create_steps(self.steps, self.config)
+        return steps
+
+
+class Pipeline:
+    """
+    A chain of stages passing their items to the next stage and the last one to the sink.
+
+    Args:
+        name (str): the name of the pipeline
+        stages (list): the `Stage`s in order
+        sink (callable): gets the items leaving the last stage
+        scheduler (FrameScheduler): optional scheduler enforcing the latency budget
+            of the phase named like the pipeline
+    """
+    @classmethod
+    def from_config(cls, name, config, configfile, sink):
+        section_name = "{}-pipeline".format(name)
+        stage_names = _split(config[section_name]["stages"])
+        logger.info("Using %s pipeline settings: stages=%s", name, ", ".join(stage_names))
+        stages = [
+            Stage.from_config(
+                "{}.{}".format(name, stage_name), config, configfile,
+                config["{}:{}".format(section_name, stage_name)])
+            for stage_name in stage_names
+        ]
+        scheduler = None
+        if name in PHASES:
+            # like the INFO signal workers, the frame ages are recorded even without budgets
+            scheduler = FrameScheduler()
+            if config.has_section("scheduler"):
+                scheduler = FrameScheduler.from_config(config["scheduler"])
+        return cls(name, stages, sink, scheduler=scheduler)
+
+    def __init__(self, name, stages, sink, scheduler=None):
+        self.name = name
+        self.stages = stages
+        self.sink = sink
+        self.scheduler = scheduler
+        for stage in stages:
+            stage.scheduler = scheduler
+            stage.phase = name
+        for stage, next_stage in zip(stages, stages[1:]):
+            stage.next = next_stage.put
+        stages[-1].next = sink if scheduler is None else self._decided
+        #: Holds the time the pipeline was started at
+        self.started_at = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self):
+        for stage in self.stages:
+            stage.stop()
+        logger.info("Stopped %s pipeline, throughput: %s", self.name, ", ".join(
+            "{} {:.1f} items/sec".format(name, throughput)
+            for name, throughput in self.throughput().items()))
+
+    def drain(self):
+        """Wait until every frame passed into the pipeline left it or was dropped."""
+        for stage in self.stages:
+            stage.drain()
+
+    def put(self, frame):
+        """Pass a `Frame` into the pipeline."""
+        self.stages[0].put(dict(frame._asdict()))
+
+    def _decided(self, item):
+        self.scheduler.decided(_frame(item), self.name)
+        self.sink(item)
+
+    def throughput(self):
+        """The items per second leaving each stage since the start."""
+        elapsed = time.perf_counter() - self.started_at
+        return {
+            stage.name: metrics.registry.counters.get(
+                "Pipeline::{} output items".format(stage.name), 0) / elapsed
+            for stage in self.stages
+        }
@@ -0,0 +1,160 @@
+"""
+Sampling profiler for all HNS processes.
+
+A thread samples the Python stacks of all other threads of its process at
+a fixed rate with ``sys._current_frames()`` and counts them as collapsed
+stacks. It samples the wall-clock time, so threads waiting for frames or
+on queues show up, too. While a thread is in OpenCV or numpy, the
+Python function calling it is sampled.
+
+The counts are written to ``<directory>/<process name>-<pid>.collapsed``,
+one ``process;thread;frame;...;frame count`` line per stack like the
+``stackcollapse`` scripts of the FlameGraph tools write them. Once
+started with `start_profiling`, every process forked by multiprocessing,
+like the Manager and the pool workers, profiles itself, too. The files of
+all processes are merged with `merge_profiles` into a single flamegraph.
+"""
+
+import os
+import sys
+import time
+import threading
+from pathlib import Path
+from collections import Counter
+from multiprocessing import current_process, util
+
+from hns.logger import get_component_logger
+
+logger = get_component_logger("Profiler")
+
+#: Holds the default time between two samples in s
+INTERVAL = 0.01
+#: Holds the time between two writes of the collapsed stacks in s,
+#: terminated pool workers don't get the chance to write them at exit
+FLUSH_INTERVAL = 1.0
+
+#: Holds the profiler of the current process
+_profiler = None
+
+
+class SamplingProfiler:
+    """
+    Sample the stacks of all threads of the current process.
+
+    Args:
+        directory (str, pathlib.Path): the directory to write the collapsed stacks to
+        interval (float): the time between two samples in s
+    """
+
+    def __init__(self, directory, interval=INTERVAL):
+        self.directory = Path(directory)
+        self.interval = interval
+        #: Holds the path of the collapsed stacks of this process
+        self.path = self.directory / "{}-{}.collapsed".format(
+            current_process().name, os.getpid())
+
+        #: Holds the number of samples by collapsed stack
+        self.stacks = Counter()
+        #: Holds the labels of the sampled code objects
+        self._labels = {}
+        #: Holds the event to stop sampling
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._sample_until_stopped, name="Profiler")
+        self._thread.daemon = True
+
+    def start(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+        self.write()
+
+    def sample(self):
+        """Sample the stacks of all threads but the profiler thread once."""
+        process = current_process().name
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own_ident = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(self._label(frame.f_code))
+                frame = frame.f_back
+            labels.append(thread_names.get(ident, str(ident)))
+            labels.append(process)
+            self.stacks[";".join(reversed(labels))] += 1
+
+    def write(self):
+        """Write the collapsed stacks, the file is replaced at once."""
+        temporary = self.path.with_suffix(".tmp")
+        write_collapsed(self.stacks, temporary)
+        os.replace(str(temporary), str(self.path))
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = "{}:{}".format(os.path.basename(code.co_filename), code.co_name)
+            self._labels[code] = label
+        return label
+
+    def _sample_until_stopped(self):
+        next_flush = time.monotonic() + FLUSH_INTERVAL
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+            if time.monotonic() >= next_flush:
+                self.write()
+                next_flush = time.monotonic() + FLUSH_INTERVAL
+
+
+def start_profiling(directory, interval=INTERVAL):
+    """Profile the current process and every process forked by multiprocessing from now on."""
+    global _profiler
+    _profiler = SamplingProfiler(directory, interval)
+    _profiler.start()
+    util.register_after_fork(_profiler, _profile_child)
+    logger.info(
+        "Profiling every %.1fms into %s", interval * 1000, str(_profiler.path))
+
+
+def stop_profiling():
+    """Stop profiling the current process and write its collapsed stacks."""
+    global _profiler
+    if _profiler is not None:
+        _profiler.stop()
+        logger.info("Wrote the profile to %s", str(_profiler.path))
+        _profiler = None
+
+
+def _profile_child(parent_profiler):
+    # the profiler thread of the parent isn't running in the forked child
+    start_profiling(parent_profiler.directory, parent_profiler.interval)
+    # written on a regular exit of the process, e.g. the Manager on shutdown
+    util.Finalize(_profiler, stop_profiling, exitpriority=1)
+
+
+def read_collapsed(path):
+    """Read the number of samples by collapsed stack from a file."""
+    stacks = Counter()
+    with open(str(path)) as collapsed_file:
+        for line in collapsed_file:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack:
+                stacks[stack] += int(count)
+    return stacks
+
+
+def write_collapsed(stacks, path):
+    with open(str(path), "w") as collapsed_file:
+        for stack, count in sorted(stacks.items()):
+            collapsed_file.write("{} {}\n".format(stack, count))
+
+
+def merge_profiles(directory):
+    """Merge the collapsed stacks of all processes profiled into the given directory."""
+    stacks = Counter()
+    for path in sorted(Path(directory).glob("*.collapsed")):
+        stacks.update(read_collapsed(path))
+    return stacks
@@ -0,0 +1,285 @@
+"""
+Offline replay of recorded frames through the signal and digit detection.
+
+The frames are packed into a memory-mapped stack and sharded in chunks
+across a process pool. Every frame is evaluated like on the track:
+the upper half for START and INFO signals, the lower half for STOP signals.
+"""
+
+import csv
+import time
+import argparse
+import multiprocessing
+from pathlib import Path
+
+import numpy as np
+
+from hns import metrics, profiler, tracing
+from hns.config import parse_config
+from hns.logger import get_component_logger
+from hns.models import SignalType
+from hns.motion_gate import MotionGate, skip_ratio
+from hns.replay_camera import PACKED_FRAMES_FILENAME, find_frames, load_frames
+from hns.signal_detector import SignalDetector
+
+logger = get_component_logger("Replay")
+
+#: Holds the columns of the replay results
+COLUMNS = [
+    "frame", "name",
+    "start_signal", "start_ms",
+    "info_signal", "info_digit", "info_ms",
+    "stop_signal", "stop_digit", "stop_ms",
+    "total_ms", "skipped",
+] + ["stop_p{}".format(digit) for digit in range(10)]
+
+#: Holds the minimum number of frames between two START signal passes, like the lap debounce
+LAP_DEBOUNCE_FRAMES = 15
+
+#: Holds the state of a replay worker process
+_worker = {}
+
+
+def evaluate_frame(frame, signal_detector, digit_detector=None):
+    """Run the detection of all signals on a single frame.
+
+    Returns:
+        dict: the detections and stage timings of the frame
+    """
+    result = {}
+    frame_start = metrics.perf_counter_ns()
+
+    start = metrics.perf_counter_ns()
+    upper_image = signal_detector.crop_image(
+        frame, [SignalType.START_SIGNAL, SignalType.INFO_SIGNAL])
+    signal = signal_detector.detect(upper_image, signal_types=[SignalType.START_SIGNAL])
+    result["start_signal"] = int(signal is not None)
+    result["start_ms"] = (metrics.perf_counter_ns() - start) / 1e6
+
+    for signal_type, prefix in (
+            (SignalType.INFO_SIGNAL, "info"), (SignalType.STOP_SIGNAL, "stop")):
+        start = metrics.perf_counter_ns()
+        signal = signal_detector.crop_and_detect(frame, signal_types=[signal_type])
+        probabilities = [0.0] * 10
+        if signal is not None and digit_detector is not None:
+            probabilities = digit_detector.predict(signal.image)
+        result[prefix + "_signal"] = int(signal is not None)
+        result[prefix + "_digit"] = int(np.argmax(probabilities)) if signal is not None else 0
+        result[prefix + "_ms"] = (metrics.perf_counter_ns() - start) / 1e6
+        if signal_type == SignalType.STOP_SIGNAL:
+            # the softmax of the STOP signals for the evaluation of the stop decision
+            for digit, probability in enumerate(probabilities):
+                result["stop_p{}".format(digit)] = float(probability)
+
+    result["total_ms"] = (metrics.perf_counter_ns() - frame_start) / 1e6
+    return result
+
+
+def open_recording(source):
+    """Open the recorded frames from a frame directory or a packed ``.npy`` stack.
+
+    Returns:
+        tuple: the memory-mapped frames, their names and the path to the packed frames
+    """
+    source = Path(source)
+    frames = load_frames(source)
+    if source.is_dir():
+        names = [path.name for path in find_frames(source)]
+        frames_path = source / PACKED_FRAMES_FILENAME
+    else:
+        names = [str(index) for index in range(len(frames))]
+        frames_path = source
+    return frames, names, frames_path
+
+
+def _init_replay_worker(configfile, frames_path, detect_digits):
+    config = parse_config(configfile, configure_logging=False)
+    _worker["frames"] = load_frames(frames_path)
+    _worker["signal_detector"] = SignalDetector.from_config(config["signal-detector"])
+    _worker["digit_detector"] = None
+    if detect_digits:
+        # NOTE: imported here, because keras is only needed if digits are detected
+        from hns.digit_detector import DigitDetector
+        _worker["digit_detector"] = DigitDetector.from_config(config["digit-detector"])
+
+
+def _replay_chunk(chunk):
+    metrics.registry.reset()
+    rows = []
+    for index in chunk:
+        with tracing.span("Replay::evaluate frame", index, capture=True):
+            row = evaluate_frame(
+                _worker["frames"][index], _worker["signal_detector"], _worker["digit_detector"])
+        row["frame"] = index
+        row["skipped"] = 0
+        rows.append(row)
+    return rows, metrics.registry.snapshot()
+
+
+def gate_frames(frames, signal_detector, motion_gate, speed=0.0):
+    """Pass the upper half of the frames through the motion gate like the async camera.
+
+    Returns:
+        list: if the frame at the index is processed
+    """
+    processed = []
+    for frame in frames:
+        upper_image = signal_detector.crop_image(
+            frame, [SignalType.START_SIGNAL, SignalType.INFO_SIGNAL])
+        processed.append(motion_gate.should_process(upper_image, speed))
+    return processed
+
+
+def count_laps(rows, debounce_frames=LAP_DEBOUNCE_FRAMES):
+    """Count the START signal passes, detections closer than the debounce are the same pass."""
+    laps = 0
+    last_detected = None
+    for row in sorted(rows, key=lambda row: row["frame"]):
+        if not row["start_signal"]:
+            continue
+        if last_detected is None or row["frame"] - last_detected > debounce_frames:
+            laps += 1
+        last_detected = row["frame"]
+    return laps
+
+
+def replay(source, configfile, workers=None, detect_digits=True, chunk_size=32,
+           motion_gate=None, speed=0.0):
+    """Replay the frames from the given source through the detection.
+
+    Args:
+        source (str, pathlib.Path): a frame directory or a packed ``.npy`` stack
+        configfile (str, pathlib.Path): path to the config file
+        workers (int): the number of worker processes, defaults to the number of cores
+        detect_digits (bool): run the digit detection on detected signals
+        chunk_size (int): the number of consecutive frames per task
+        motion_gate (MotionGate): optional gate to skip unchanged frames
+        speed (float): the speed in m/s to scale the threshold of the motion gate with
+
+    Returns:
+        tuple: the per-frame rows and the duration of the replay in seconds
+    """
+    frames, names, frames_path = open_recording(source)
+
+    rows = []
+    started_at = time.perf_counter()
+    processed = [True] * len(frames)
+    if motion_gate is not None:
+        # NOTE: sequential in this process, the gate compares against the last processed frame
+        config = parse_config(configfile, configure_logging=False)
+        processed = gate_frames(
+            frames, SignalDetector.from_config(config["signal-detector"]), motion_gate, speed)
+        for index, process in enumerate(processed):
+            if not process:
+                row = {column: 0 for column in COLUMNS if column != "name"}
+                row["frame"] = index
+                row["skipped"] = 1
+                rows.append(row)
+
+    chunks = [
+        [index for index in range(start, min(start + chunk_size, len(frames)))
+         if processed[index]]
+        for start in range(0, len(frames), chunk_size)
+    ]
+    chunks = [chunk for chunk in chunks if chunk]
+    logger.info(
+        "Replaying %d frames from %s in %d chunks", len(frames), source, len(chunks))
+    with multiprocessing.Pool(
+            processes=workers, initializer=_init_replay_worker,
+            initargs=(str(configfile), str(frames_path), detect_digits)) as pool:
+        # NOTE: the pool start-up is part of the replay duration
+        for chunk_rows, snapshot in pool.imap(_replay_chunk, chunks):
+            rows.extend(chunk_rows)
+            metrics.registry.merge(snapshot)
+        # let the workers exit instead of terminating them, so that they run their exit handlers
+        pool.close()
+        pool.join()
+    duration = time.perf_counter() - started_at
+
+    rows.sort(key=lambda row: row["frame"])
+    for row in rows:
+        row["name"] = names[row["frame"]]
+    return rows, duration
+
+
+def write_results(rows, output):
+    """Write the replay results as CSV or, if the output ends with ``.parquet``, as Parquet."""
+    output = Path(output)
+    if output.suffix == ".parquet":
+        import pandas as pd
+        pd.DataFrame(rows, columns=COLUMNS).to_parquet(str(output))
+        return
+
+    with open(str(output), "w", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(args):
+    """Entry point for ``python -m hns replay``."""
+    parser = argparse.ArgumentParser(
+        prog="hns replay", description="Replay recorded frames through the detection")
+    parser.add_argument(
+        "source", metavar="FRAMES", type=Path,
+        help="Frame directory or packed .npy stack to replay")
+    parser.add_argument(
+        "-c", "--config", type=Path,
+        default=Path(__file__).parent / "../configs/stable.ini",
+        help="Path to the configuration file")
+    parser.add_argument(
+        "-w", "--workers", type=int, default=None,
+        help="Number of worker processes, defaults to the number of cores")
+    parser.add_argument(
+        "-o", "--output", type=Path, default=Path("replay.csv"),
+        help="Path to the results, .csv or .parquet")
+    parser.add_argument(
+        "--no-digits", action="store_true",
+        help="Only detect signals, do not run the digit detection")
+    parser.add_argument(
+        "--motion-gate", action="store_true",
+        help="Skip unchanged frames with the motion gate configured in [motion-gate]")
+    parser.add_argument(
+        "--speed", type=float, default=0.0,
+        help="Speed in m/s to scale the motion gate threshold with, "
+             "defaults to standstill, which skips the most frames")
+    parser.add_argument(
+        "--profile", metavar="DIRECTORY", type=Path,
+        help="Sample the stacks of all processes into collapsed stack files in the directory")
+    parser.add_argument(
+        "--trace", metavar="DIRECTORY", type=Path,
+        help="Trace the frames through all processes into trace files in the directory")
+    args = parser.parse_args(args)
+
+    if args.profile is not None:
+        profiler.start_profiling(args.profile)
+    if args.trace is not None:
+        tracing.start_tracing(args.trace)
+
+    config = parse_config(args.config)
+    motion_gate = None
+    if args.motion_gate:
+        motion_gate = MotionGate.from_config(config["motion-gate"])
+    try:
+        rows, duration = replay(
+            args.source, args.config, workers=args.workers, detect_digits=not args.no_digits,
+            motion_gate=motion_gate, speed=args.speed)
+    finally:
+        profiler.stop_profiling()
+        tracing.stop_tracing()
+    write_results(rows, args.output)
+
+    logger.info(
+        "Replayed %d frames in %.3fs: %.1f frames/sec, "
+        "detected %d START, %d INFO and %d STOP signals",
+        len(rows), duration, len(rows) / duration,
+        sum(row["start_signal"] for row in rows),
+        sum(row["info_signal"] for row in rows),
+        sum(row["stop_signal"] for row in rows))
+    logger.info("Counted %d laps", count_laps(rows))
+    if motion_gate is not None:
+        logger.info(
+            "Motion gate skipped %d frames (%.1f%%)",
+            sum(row["skipped"] for row in rows), 100 * skip_ratio())
+    logger.info(metrics.registry.summary())
+    logger.info("Results at: %s", str(args.output))
@@ -0,0 +1,165 @@
+"""
+HNS 2/4 replay camera
+
+Replays recorded frames, e.g. from ``tests/images/track`` or a run recorded
+with ``scripts/imaging.py``, with the same interface as the `Camera`.
+
+The frames are packed once into a single ``.npy`` stack which is
+memory-mapped for the replay, so that no image has to be decoded
+while replaying.
+"""
+
+import re
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from hns.logger import get_component_logger
+from hns.models import YUVImage
+
+logger = get_component_logger("ReplayCamera")
+
+#: Holds the pattern of the recorded frame file names
+FRAME_PATTERN = re.compile(r"^frame-(\d+)\.jpg$")
+
+#: Holds the file name of the packed frames in a frame directory
+PACKED_FRAMES_FILENAME = "frames.npy"
+
+
+def find_frames(directory):
+    """Return the recorded frames in the given directory ordered by their frame id."""
+    frames = []
+    for path in Path(directory).iterdir():
+        match = FRAME_PATTERN.match(path.name)
+        if match:
+            frames.append((int(match.group(1)), path))
+    return [path for _, path in sorted(frames)]
+
+
+def pack_frames(directory, output=None):
+    """Pack the recorded frames of the given directory into a single ``.npy`` stack.
+
+    Returns:
+        pathlib.Path: the path to the packed frames
+    """
+    directory = Path(directory)
+    output = Path(output) if output is not None else directory / PACKED_FRAMES_FILENAME
+    frame_paths = find_frames(directory)
+    if not frame_paths:
+        raise ValueError("No frames found in '{}'".format(directory))
+
+    first_frame = cv2.imread(str(frame_paths[0]))
+    logger.info(
+        "Packing %d frames of %dx%d from %s to %s",
+        len(frame_paths), first_frame.shape[1], first_frame.shape[0], directory, output)
+
+    stack = np.lib.format.open_memmap(
+        str(output), mode="w+", dtype=np.uint8, shape=(len(frame_paths),) + first_frame.shape)
+    for index, frame_path in enumerate(frame_paths):
+        frame = cv2.imread(str(frame_path))
+        if frame is None or frame.shape != first_frame.shape:
+            raise ValueError("Frame '{}' cannot be packed".format(frame_path))
+        stack[index] = frame
+    stack.flush()
+    del stack
+    return output
+
+
+def load_frames(source):
+    """Load the packed frames from the given source memory-mapped.
+
+    The source is either a packed ``.npy`` stack or a frame directory.
+    A frame directory is packed on first use and re-packed if it contains newer frames.
+    """
+    source = Path(source)
+    if source.is_dir():
+        packed_frames = source / PACKED_FRAMES_FILENAME
+        frame_paths = find_frames(source)
+        newest_frame = max((p.stat().st_mtime for p in frame_paths), default=0)
+        if not packed_frames.exists() or packed_frames.stat().st_mtime < newest_frame:
+            pack_frames(source, packed_frames)
+        source = packed_frames
+
+    return np.load(str(source), mmap_mode="r")
+
+
+class ReplayCamera:
+    """
+    Camera interface replaying recorded frames.
+
+    Args:
+        source (str, pathlib.Path): a frame directory or a packed ``.npy`` stack
+        fps (float): the frame rate to replay with in real-time
+        realtime (bool): replay in real-time, otherwise as fast as the frames are consumed
+        loop (bool): restart from the first frame at the end of the recording
+        capture_format (str): the format of the frames, either ``bgr`` or ``yuv``
+    """
+    @classmethod
+    def from_config(cls, config):
+        logger.info(
+            "Using ReplayCamera settings: source=%s, fps=%s, speed=%s, loop=%s, format=%s",
+            config["source"], config.get("replay_fps", "30"),
+            config.get("replay_speed", "realtime"), config.get("replay_loop", "no"),
+            config.get("format", "bgr")
+        )
+        source = config["source"]
+        fps = config.getfloat("replay_fps", 30)
+        realtime = config.get("replay_speed", "realtime") == "realtime"
+        loop = config.getboolean("replay_loop", False)
+        capture_format = config.get("format", "bgr")
+        return cls(source, fps=fps, realtime=realtime, loop=loop, capture_format=capture_format)
+
+    def __init__(self, source, fps=30, realtime=True, loop=False, capture_format="bgr"):
+        self.source = source
+        self.fps = fps
+        self.realtime = realtime
+        self.loop = loop
+        self.capture_format = capture_format
+
+        #: Holds the memory-mapped frame stack
+        self.frames = load_frames(source)
+        #: Holds the index of the next frame to replay
+        self.position = 0
+        #: Holds the time the replay started in real-time mode
+        self.__started_at = None
+        logger.info("Replaying %d frames from %s", len(self.frames), source)
+
+    def reset(self):
+        """Reset stream
+
+        There is nothing buffered in a replay, a new stream continues
+        where the last one stopped, just like the live camera.
+        """
+
+    def stream(self):
+        """Access the replayed camera stream"""
+        while True:
+            if self.realtime:
+                if self.__started_at is None:
+                    self.__started_at = time.time() - self.position / self.fps
+                # like a live camera, frames are dropped if they are not consumed in time
+                position = max(self.position, int((time.time() - self.__started_at) * self.fps))
+                frame_time = self.__started_at + position / self.fps
+                delay = frame_time - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                position = self.position
+
+            if position >= len(self.frames):
+                if not self.loop:
+                    logger.info("Replay finished after %d frames", len(self.frames))
+                    return
+                self.__started_at = None
+                self.position = 0
+                continue
+
+            self.position = position + 1
+
+            # a view into the memory-mapped stack, nothing is decoded or copied here
+            image = np.asarray(self.frames[position])
+            if self.capture_format == "yuv":
+                image = YUVImage.from_bgr(image)
+            yield image
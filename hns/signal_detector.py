@@ -10,13 +10,21 @@ import numpy as np
 
 from hns.logger import get_component_logger
 from hns.utils import timeit
-from hns.models import SignalType
+from hns.models import SignalType, YUVImage
+from hns.template_bank import TemplateBank, hs_histogram
 
 logger = get_component_logger("SignalDetector")
 
 # Type to represent a detected signal
 DetectedSignal = namedtuple("DetectedSignal", ["type", "image", "data"])
 
+#: Holds the number of image shapes to keep preallocated buffers for
+BUFFER_SHAPES = 4
+#: Holds the supported engines generating the number candidates of INFO and STOP signals
+CANDIDATE_ENGINES = ("contours", "components")
+#: Holds the supported polarities of the numbers found by the components engine
+COMPONENT_POLARITIES = ("both", "dark", "bright")
+
 
 def sliding_window(image, window_size, step_size=1):
     for y in range(0, image.shape[0], step_size):
@@ -24,6 +32,15 @@ def sliding_window(image, window_size, step_size=1):
             yield (x, y, image[y:y + window_size[1], x:x + window_size[0]])
 
 
+def sliding_window_rows(image, window_size, step_size=1):
+    """Like `sliding_window`, but yield each row of windows as list of (x, window)."""
+    for y in range(0, image.shape[0], step_size):
+        yield y, [
+            (x, image[y:y + window_size[1], x:x + window_size[0]])
+            for x in range(0, image.shape[1], step_size)
+        ]
+
+
 class SignalDetector:
     """
     Functionality to detect a signal.
@@ -44,12 +61,23 @@ class SignalDetector:
             config["canny_aperture_size"]
         )
         logger.info(
-            "Using box detection settings: min box size=%s",
-            config["minimum_box_size"]
+            "Using box detection settings: min box size=%s, "
+            "width=%s-%s, height=%s-%s, height/width ratio=%s-%s",
+            config["minimum_box_size"],
+            config.get("box_min_width", "4"), config.get("box_max_width", "50"),
+            config.get("box_min_height", "15"), config.get("box_max_height", "60"),
+            config.get("box_min_ratio", "1.45"), config.get("box_max_ratio", "6"),
         )
         logger.info(
-            "Using start signal settings: template=%s, match confidence=%s",
-            config["startsignal_template"],
+            "Using candidate settings: engine=%s, components threshold=%s, polarity=%s",
+            config.get("candidate_engine", "contours"),
+            config.get("components_threshold", "30"), config.get("components_polarity", "both")
+        )
+        logger.info(
+            "Using start signal settings: templates=%s, scales=%s, cache=%s, match confidence=%s",
+            config.get("startsignal_templates", config.get("startsignal_template")),
+            config.get("startsignal_scales", "1"),
+            config.get("startsignal_cache", "none"),
             config["startsignal_match_confidence"]
         )
 
@@ -58,40 +86,83 @@ class SignalDetector:
         canny_threshold2 = config.getint("canny_threshold2")
         canny_aperture_size = config.getint("canny_aperture_size")
         minimum_box_size = config.getint("minimum_box_size")
-        startsignal_template = Path(__file__).parent / config["startsignal_template"]
+        box_width_range = (config.getint("box_min_width", 4), config.getint("box_max_width", 50))
+        box_height_range = (
+            config.getint("box_min_height", 15), config.getint("box_max_height", 60))
+        box_ratio_range = (
+            config.getfloat("box_min_ratio", 1.45), config.getfloat("box_max_ratio", 6))
+        startsignal_templates = [
+            Path(__file__).parent / template.strip()
+            for template in config.get(
+                "startsignal_templates", config.get("startsignal_template")).split(",")
+            if template.strip()
+        ]
+        startsignal_scales = [
+            float(scale) for scale in config.get("startsignal_scales", "1").split(",")
+        ]
+        startsignal_cache = config.get("startsignal_cache")
+        startsignal_bank = TemplateBank.from_files(
+            startsignal_templates, startsignal_scales,
+            cache_path=Path(__file__).parent / startsignal_cache if startsignal_cache else None)
         startsignal_match_confidence = config.getfloat("startsignal_match_confidence")
         return cls(
             canny_threshold1,
             canny_threshold2,
             canny_aperture_size,
             minimum_box_size,
-            startsignal_template,
-            startsignal_match_confidence
+            startsignal_bank,
+            startsignal_match_confidence,
+            box_width_range=box_width_range,
+            box_height_range=box_height_range,
+            box_ratio_range=box_ratio_range,
+            candidate_engine=config.get("candidate_engine", "contours"),
+            components_threshold=config.getint("components_threshold", 30),
+            components_polarity=config.get("components_polarity", "both")
         )
 
     def __init__(self, canny_threshold1, canny_threshold2, canny_aperture_size,
                  minimum_box_size,
-                 startsignal_template, startsignal_match_confidence):
+                 startsignal_template, startsignal_match_confidence,
+                 box_width_range=(4, 50), box_height_range=(15, 60), box_ratio_range=(1.45, 6),
+                 candidate_engine="contours",
+                 components_threshold=30, components_polarity="both"):
+        if candidate_engine not in CANDIDATE_ENGINES:
+            raise ValueError("Unknown candidate engine '{}', use one of {}".format(
+                candidate_engine, ", ".join(CANDIDATE_ENGINES)))
+        if components_polarity not in COMPONENT_POLARITIES:
+            raise ValueError("Unknown components polarity '{}', use one of {}".format(
+                components_polarity, ", ".join(COMPONENT_POLARITIES)))
+
         self.__canny_threshold1 = canny_threshold1
         self.__canny_threshold2 = canny_threshold2
         self.__canny_aperture_size = canny_aperture_size
         self.__minimum_box_size = minimum_box_size
+        # widths and heights are exclusive bounds, ratios inclusive bounds
+        self.__box_width_range = box_width_range
+        self.__box_height_range = box_height_range
+        self.__box_ratio_range = box_ratio_range
         self.__startsignal_match_confidence = startsignal_match_confidence
-
-        # load and prepare startsignal template
-        self.__startsignal_template = cv2.resize(cv2.imread(str(startsignal_template)), (30, 30))
-        self.__startsignal_template_hsv = cv2.cvtColor(
-                self.__startsignal_template, cv2.COLOR_BGR2HSV)
+        #: Holds the engine generating the number candidates, see `CANDIDATE_ENGINES`
+        self.__candidate_engine = candidate_engine
+        self.__components_threshold = components_threshold
+        #: Holds the threshold types of the polarities to search, dark numbers first
+        self.__components_threshold_types = [
+            threshold_type for polarity, threshold_type in (
+                ("dark", cv2.THRESH_BINARY_INV), ("bright", cv2.THRESH_BINARY))
+            if components_polarity in (polarity, "both")
+        ]
+
+        # a single template file is a bank of the template at scale 1
+        if not isinstance(startsignal_template, TemplateBank):
+            startsignal_template = TemplateBank.from_files([startsignal_template])
+        #: Holds the histograms of the startsignal templates
+        self.__startsignal_templates = startsignal_template
         self.__startsignal_lower_blue_mask = np.array([110, 180, 0])
         self.__startsignal_upper_blue_mask = np.array([130, 255, 255])
-        self.__startsignal_template_hist = cv2.calcHist(
-            [self.__startsignal_template_hsv],
-            channels=[0, 1], mask=None, histSize=[45, 32], ranges=[0, 180, 0, 256])
-        cv2.normalize(
-            self.__startsignal_template_hist, self.__startsignal_template_hist,
-            alpha=0, beta=1, norm_type=cv2.NORM_MINMAX)
 
         self.__laplace_filter = np.array([[0, -1, 0], [-1, 4, -1], [0, -1, 0]])
+        #: Holds the preallocated gray, canny and laplace images by image shape
+        self.__buffers = {}
 
     @timeit(logger, "SignalDetector::crop and detect")
     def crop_and_detect(self, image, signal_types=None):
@@ -103,7 +174,7 @@ class SignalDetector:
         """Detect a signal in the given image.
 
         Args:
-            image (numpy.array): 3 channel RGB numpy image
+            image (numpy.array, YUVImage): 3 channel BGR numpy image or YUV image
         """
         if SignalType.START_SIGNAL in signal_types:
             is_start_signal, data = self._find_startsignal(image)
@@ -114,9 +185,7 @@ class SignalDetector:
                 and SignalType.INFO_SIGNAL not in signal_types:
             return None
 
-        image, gray_image = self._prepare_image(image)
-        contours = self._get_contours(image)
-        image = self._find_number_on_signal(image, contours, gray_image)
+        image = self._detect_number(image)
         if image is None:
             return None
 
@@ -127,6 +196,23 @@ class SignalDetector:
         )
         return DetectedSignal(detected_signal_type, image, None)
 
+    def _detect_number(self, image):
+        """Search the image for a number on a signal with the candidate engine.
+
+        Returns:
+            numpy.array: the cropped number or ``None``
+        """
+        if self.__candidate_engine == "components":
+            gray_image = self._gray_image(image)
+            found = self._locate_number_in_components(self._get_components(gray_image), gray_image)
+        else:
+            prepared_image, gray_image = self._prepare_image(image)
+            contours = self._get_contours(prepared_image)
+            found = self._locate_number_on_signal(prepared_image, contours, gray_image)
+        if found is None:
+            return None
+        return found[0]
+
     @timeit(logger, "SignalDetector::crop image")
     def crop_image(self, image, signal_types):
         # crop image according to the signal type
@@ -142,6 +228,9 @@ class SignalDetector:
 
         # crop image to a view from 50-200 Pixel in X
         image = image[:, 50:200]
+        if isinstance(image, YUVImage):
+            # only the start signal band needs the chroma planes
+            image = image.to_bgr()
 
         image_hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
         mask = cv2.inRange(
@@ -151,32 +240,30 @@ class SignalDetector:
         if np.count_nonzero(mask) < 450:
             return False, (matched_signal_bhatt, matched_signal_pos)
 
-        sliding_window_generator = sliding_window(
-            image_hsv,
-            (self.__startsignal_template.shape[0], self.__startsignal_template.shape[1]),
-            step_size=10
-        )
-
-        for x, y, window in sliding_window_generator:
-            window_hist = cv2.calcHist(
-                [window], channels=[0, 1], mask=None,
-                histSize=[45, 32], ranges=[0, 180, 0, 256])
-            cv2.normalize(window_hist, window_hist, alpha=0, beta=1, norm_type=cv2.NORM_MINMAX)
-            dist_bhatt = cv2.compareHist(
-                # window_hist, self.__startsignal_template_hist,
-                self.__startsignal_template_hist, window_hist,
-                cv2.HISTCMP_BHATTACHARYYA)
-
-            if matched_signal_bhatt >= dist_bhatt:
-                matched_signal_bhatt = dist_bhatt
-                matched_signal_pos = (x, y)
-
-                if matched_signal_bhatt <= self.__startsignal_match_confidence:
-                    logger.info(
-                        "Found start signal at %s with bhatt distance of %f in confidence %f",
-                        str(matched_signal_pos),
-                        matched_signal_bhatt, self.__startsignal_match_confidence)
+        # the histograms of a row of windows are compared with all templates of their size at once
+        found = False
+        for window_size in self.__startsignal_templates.sizes:
+            for y, row in sliding_window_rows(
+                    image_hsv, (window_size, window_size), step_size=10):
+                distances = self.__startsignal_templates.distances(
+                    [hs_histogram(window).ravel() for _, window in row], window_size)
+
+                for (x, _), dist_bhatt in zip(row, distances):
+                    if matched_signal_bhatt >= dist_bhatt:
+                        matched_signal_bhatt = float(dist_bhatt)
+                        matched_signal_pos = (x, y)
+
+                        if matched_signal_bhatt <= self.__startsignal_match_confidence:
+                            logger.info(
+                                "Found start signal at %s with bhatt distance of %f "
+                                "in confidence %f", str(matched_signal_pos),
+                                matched_signal_bhatt, self.__startsignal_match_confidence)
+                            found = True
+                            break
+                if found:
                     break
+            if found:
+                break
 
         logger.debug(
             "Highest confidence for start signal %f <= %f",
@@ -186,19 +273,44 @@ class SignalDetector:
             (matched_signal_bhatt, matched_signal_pos)
         )
 
+    def _buffers(self, shape):
+        """The preallocated gray and edge or binary images for an image of the given shape.
+
+        The buffers are reused for every frame, so nothing returned
+        by the detection may reference them, see `_locate_number_on_signal`.
+        """
+        buffers = self.__buffers.get(shape)
+        if buffers is None:
+            # bound the memory of a detector seeing images of many shapes
+            if len(self.__buffers) >= BUFFER_SHAPES:
+                self.__buffers.clear()
+            buffers = tuple(np.empty(shape, dtype=np.uint8) for _ in range(3))
+            self.__buffers[shape] = buffers
+        return buffers
+
+    def _gray_image(self, image):
+        # the luma plane of a YUV image is already gray
+        if isinstance(image, YUVImage):
+            return image.to_gray()
+        if image.ndim == 2:
+            return image
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=self._buffers(image.shape[:2])[0])
+
     @timeit(logger, "SignalDetector::image preparation")
     def _prepare_image(self, image):
-        # gray scaling
-        gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        """Find the edges of a BGR, YUV or gray image."""
+        gray_image = self._gray_image(image)
+        _, canny_buffer, laplace_buffer = self._buffers(image.shape[:2])
 
         # edge detection with canny (https://docs.opencv.org/3.1.0/da/d22/tutorial_py_canny.html)
+        # NOTE: the 4th positional argument is the output `edges`, not the aperture size
         canny_image = cv2.Canny(
                 gray_image,
                 self.__canny_threshold1, self.__canny_threshold2,
-                self.__canny_aperture_size
+                edges=canny_buffer, apertureSize=self.__canny_aperture_size
         )
 
-        laplace_image = cv2.filter2D(canny_image, -1, self.__laplace_filter)
+        laplace_image = cv2.filter2D(canny_image, -1, self.__laplace_filter, dst=laplace_buffer)
         return laplace_image, gray_image
 
     @timeit(logger, "SignalDetector::get contours")
@@ -208,8 +320,63 @@ class SignalDetector:
         _, contours = cv2.findContours(image, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)[:2]
         return contours
 
-    @timeit(logger, "SignalDetector::find number on signal")
+    @timeit(logger, "SignalDetector::get components")
+    def _get_components(self, gray_image):
+        """The bounding boxes of the components with the size and ratio of a number.
+
+        The gray image is thresholded into dark and, or bright components. Their
+        areas and bounding boxes are gated all at once like the contours in
+        `_locate_number_on_signal`.
+
+        Returns:
+            numpy.array: the boxes ``(x, y, w, h)`` of the candidates, one per row
+        """
+        candidates = []
+        for threshold_type, binary_buffer in zip(
+                self.__components_threshold_types, self._buffers(gray_image.shape[:2])[1:]):
+            binary_image = cv2.threshold(
+                gray_image, self.__components_threshold, 255, threshold_type,
+                dst=binary_buffer)[1]
+            _, _, stats, _ = cv2.connectedComponentsWithStats(binary_image, connectivity=8)
+            # the first component is the background
+            x, y, w, h, area = stats[1:].T
+            candidate = (
+                (area >= self.__minimum_box_size)
+                & (w > self.__box_width_range[0]) & (w < self.__box_width_range[1])
+                & (h > self.__box_height_range[0]) & (h < self.__box_height_range[1])
+                & (h >= self.__box_ratio_range[0] * w) & (h <= self.__box_ratio_range[1] * w)
+            )
+            candidates.append(stats[1:][candidate, :4])
+        return np.concatenate(candidates)
+
+    @timeit(logger, "SignalDetector::find number in components")
+    def _locate_number_in_components(self, boxes, gray_image):
+        """Find the number on a signal in the candidate boxes of `_get_components`.
+
+        Returns:
+            tuple: the cropped number and its bounding box ``(x, y, w, h)`` or ``None``
+        """
+        for box in boxes.tolist():
+            if self._is_garbage(gray_image, box):
+                logger.debug("Drop component because it might be a window")
+                continue
+            box = tuple(box)
+            return self._crop_number(gray_image, box), box
+        return None
+
     def _find_number_on_signal(self, image, contours, gray_image):
+        found = self._locate_number_on_signal(image, contours, gray_image)
+        if found is None:
+            return None
+        return found[0]
+
+    @timeit(logger, "SignalDetector::find number on signal")
+    def _locate_number_on_signal(self, image, contours, gray_image):
+        """Find the number on a signal.
+
+        Returns:
+            tuple: the cropped number and its bounding box ``(x, y, w, h)`` or ``None``
+        """
         for contour_id, contour in enumerate(contours):
             # skip too small objects
             if abs(cv2.contourArea(contour)) < self.__minimum_box_size:
@@ -220,97 +387,104 @@ class SignalDetector:
             x, y, w, h = cv2.boundingRect(contour)
 
             # drop contour with wrong widths
-            if w <= 4 or w >= 50:
+            if w <= self.__box_width_range[0] or w >= self.__box_width_range[1]:
                 logger.debug("Drop contour because width wrong")
                 continue
 
             # drop contour with wrong heights
-            if h <= 15 or h >= 60:
+            if h <= self.__box_height_range[0] or h >= self.__box_height_range[1]:
                 logger.debug("Drop contour because height wrong")
                 continue
 
             # drop contour with wrong ratios
             h_w_ratio = float(h) / float(w)
-            if h_w_ratio < 1.45 or h_w_ratio > 6:
+            if h_w_ratio < self.__box_ratio_range[0] or h_w_ratio > self.__box_ratio_range[1]:
                 logger.debug("Drop contour because ratio wrong %f / %f = %f", h, w, h_w_ratio)
                 continue
 
-            def is_garbage():
-                addition_in_y = h // 8
-                addition_in_x = w // 3
-
-                cropped_number = gray_image[
-                    max(0, y - addition_in_y): min(y + h + addition_in_y, gray_image.shape[0]),
-                    max(0, x - addition_in_x): min(x + w + addition_in_x, gray_image.shape[1])
-                ]
-
-                # it needs to be at least 20 pixels in height
-                if cropped_number.shape[0] < 20:
-                    logger.debug(
-                        "Drop as garbage because it's not at least 20 pixel in height, it's %d",
-                        cropped_number.shape[0])
-                    return True
-
-                binary_number = cv2.threshold(cropped_number, 30, 255, cv2.THRESH_BINARY)[1]
-                # from hns.utils import debug_image
-                # debug_image(binary_number)
-
-                def array_is_white(array):
-                    # 255 * 0.75 = 191.25
-                    return array.sum() >= (array.size * 191.25)
-
-                # invert black signals
-                if not array_is_white(binary_number[-1, :]):
-                    binary_number = cv2.bitwise_not(binary_number)
-
-                # check if all borders are white enough
-                if not array_is_white(binary_number[:, 0]):
-                    logger.debug("Drop as garbage because left border is not white enough")
-                    return True
-
-                if not array_is_white(binary_number[:, -1]):
-                    logger.debug("Drop as garbage because right border is not white enough")
-                    return True
-
-                if not array_is_white(binary_number[0, :]):
-                    logger.debug("Drop as garbage because top border is not white enough")
-                    return True
-
-                if not array_is_white(binary_number[-1, :]):
-                    logger.debug("Drop as garbage because bottom border is not white enough")
-                    return True
-
-                # calculate the ratio between black and white pixels
-                b_w_ratio = np.count_nonzero(binary_number) / np.prod(binary_number.shape)
-                if b_w_ratio < 0.5 or b_w_ratio > 0.9:
-                    logger.debug(
-                        "Drop as garbage because black and white ratio is wrong %f", b_w_ratio)
-                    return True
-
-                # check if a middle row only contains white color
-                rows, _ = binary_number.shape
-                bound = round(rows * 0.2)
-                middle_rows = binary_number[bound:-1 * bound, :]
-                for row in middle_rows:
-                    if row.sum() == row.size * 255:
-                        logger.debug(
-                            "Drop as garbage because a row between %d and %d was completely white",
-                            bound, -1 * bound)
-                        return True
-
-                # it's most likely not garbage
-                return False
-
-            if is_garbage():
+            box = (x, y, w, h)
+            if self._is_garbage(gray_image, box):
                 logger.debug("Drop contour because it might be a window")
                 continue
 
-            addition_in_y = round(h / 5)
-            addition_in_x = round(w / 2)
-            cropped_image = gray_image[
-                max(0, y - addition_in_y): min(y + h + addition_in_y, gray_image.shape[0]),
-                max(0, x - addition_in_x): min(x + w + addition_in_x, gray_image.shape[1])
-            ]
-            return cropped_image
+            return self._crop_number(gray_image, box), box
 
         return None
+
+    def _is_garbage(self, gray_image, box):
+        """Check if the box around a number candidate isn't a number on a signal, e.g. a window."""
+        x, y, w, h = box
+        addition_in_y = h // 8
+        addition_in_x = w // 3
+
+        cropped_number = gray_image[
+            max(0, y - addition_in_y): min(y + h + addition_in_y, gray_image.shape[0]),
+            max(0, x - addition_in_x): min(x + w + addition_in_x, gray_image.shape[1])
+        ]
+
+        # it needs to be at least 20 pixels in height
+        if cropped_number.shape[0] < 20:
+            logger.debug(
+                "Drop as garbage because it's not at least 20 pixel in height, it's %d",
+                cropped_number.shape[0])
+            return True
+
+        binary_number = cv2.threshold(cropped_number, 30, 255, cv2.THRESH_BINARY)[1]
+        # from hns.utils import debug_image
+        # debug_image(binary_number)
+
+        def array_is_white(array):
+            # 255 * 0.75 = 191.25
+            return array.sum() >= (array.size * 191.25)
+
+        # invert black signals
+        if not array_is_white(binary_number[-1, :]):
+            binary_number = cv2.bitwise_not(binary_number)
+
+        # check if all borders are white enough
+        if not array_is_white(binary_number[:, 0]):
+            logger.debug("Drop as garbage because left border is not white enough")
+            return True
+
+        if not array_is_white(binary_number[:, -1]):
+            logger.debug("Drop as garbage because right border is not white enough")
+            return True
+
+        if not array_is_white(binary_number[0, :]):
+            logger.debug("Drop as garbage because top border is not white enough")
+            return True
+
+        if not array_is_white(binary_number[-1, :]):
+            logger.debug("Drop as garbage because bottom border is not white enough")
+            return True
+
+        # calculate the ratio between black and white pixels
+        b_w_ratio = np.count_nonzero(binary_number) / np.prod(binary_number.shape)
+        if b_w_ratio < 0.5 or b_w_ratio > 0.9:
+            logger.debug(
+                "Drop as garbage because black and white ratio is wrong %f", b_w_ratio)
+            return True
+
+        # check if a middle row only contains white color
+        rows, _ = binary_number.shape
+        bound = round(rows * 0.2)
+        middle_rows = binary_number[bound:-1 * bound, :]
+        for row in middle_rows:
+            if row.sum() == row.size * 255:
+                logger.debug(
+                    "Drop as garbage because a row between %d and %d was completely white",
+                    bound, -1 * bound)
+                return True
+
+        # it's most likely not garbage
+        return False
+
+    def _crop_number(self, gray_image, box):
+        x, y, w, h = box
+        addition_in_y = round(h / 5)
+        addition_in_x = round(w / 2)
+        # copied, the gray image is a buffer reused for the next frame
+        return gray_image[
+            max(0, y - addition_in_y): min(y + h + addition_in_y, gray_image.shape[0]),
+            max(0, x - addition_in_x): min(x + w + addition_in_x, gray_image.shape[1])
+        ].copy()
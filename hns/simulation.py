@@ -0,0 +1,231 @@
+"""
+Simulation of the drive and the crane of the 2/4 HNS.
+
+The `SimulatedDrive` replaces the serial port of the UART communication.
+It decodes the movement commands written by the HNS, integrates the
+speed and the driven distance and answers with status frames, just like
+the drive controller does. The pick-up bit of the status byte is set
+after a configurable delay, so the crane does not block.
+
+Together with the `ReplayCamera` the whole run of the HNS can be
+executed on any machine with ``python -m hns --simulate``.
+"""
+
+import time
+import struct
+import threading
+import collections
+
+from hns.logger import get_component_logger
+from hns.uart_communication import encode_to_frame, decode_frame, pop_frame
+
+logger = get_component_logger("Simulation")
+
+#: Holds the distance in mm of a distance to go tick of the movement command
+MM_PER_DISTANCE_TICK = 8.45
+#: Holds the scale of the speed in the status frame, in 1/80 m/s
+STATUS_SPEED_SCALE = 80
+#: Holds the scale of the wheel cycles in the status frame
+STATUS_WHEEL_CYCLES_SCALE = 9
+#: Holds the bit of the status byte indicating the cube is picked up
+STATUS_CUBE_PICKED = 0x01
+
+
+class SimulatedDrive:
+    """
+    In-process simulation of the drive controller behind the serial port.
+
+    Implements the subset of the ``serial.Serial`` interface the
+    `UartCommunicator` uses, so it can be assigned to its ``uart``.
+
+    Args:
+        pickup_delay (float): seconds after opening until the cube is picked up
+        mm_per_second_per_percent (float): the speed in mm/s for each percent of the target speed
+        acceleration (float): the acceleration and deceleration in mm/s^2
+        status_interval (float): seconds between two status frames
+        approach_speed (float): the speed in percent to drive a distance to go when stopped
+        mm_per_wheel_cycle (float): the distance driven during one wheel cycle in mm
+    """
+    @classmethod
+    def from_config(cls, config, mm_per_wheel_cycle=76.05):
+        logger.info(
+            "Using SimulatedDrive settings: pickup_delay=%s, mm_per_second_per_percent=%s, "
+            "acceleration=%s, status_interval=%s, approach_speed=%s",
+            config.get("pickup_delay", "2"), config.get("mm_per_second_per_percent", "25"),
+            config.get("acceleration", "1500"), config.get("status_interval", "0.05"),
+            config.get("approach_speed", "5")
+        )
+        return cls(
+            pickup_delay=config.getfloat("pickup_delay", 2),
+            mm_per_second_per_percent=config.getfloat("mm_per_second_per_percent", 25),
+            acceleration=config.getfloat("acceleration", 1500),
+            status_interval=config.getfloat("status_interval", 0.05),
+            approach_speed=config.getfloat("approach_speed", 5),
+            mm_per_wheel_cycle=mm_per_wheel_cycle
+        )
+
+    def __init__(self, pickup_delay=2, mm_per_second_per_percent=25, acceleration=1500,
+                 status_interval=0.05, approach_speed=5, mm_per_wheel_cycle=76.05):
+        self.pickup_delay = pickup_delay
+        self.mm_per_second_per_percent = mm_per_second_per_percent
+        self.acceleration = acceleration
+        self.status_interval = status_interval
+        self.approach_speed = approach_speed
+        self.mm_per_wheel_cycle = mm_per_wheel_cycle
+
+        #: Holds the current speed in mm/s
+        self.speed = 0.0
+        #: Holds the total driven distance in mm
+        self.distance = 0.0
+        #: Holds the target speed in percent
+        self.target_speed = 0.0
+        #: Holds the remaining distance to go in mm or ``None`` without one
+        self.distance_to_go = None
+        #: Holds the bytes written by the HNS which are not decoded yet
+        self.__received = collections.deque()
+        #: Holds the encoded status frames not read by the HNS yet
+        self.__pending = bytearray()
+        self.__lock = threading.Lock()
+        self.__opened_at = None
+        self.__updated_at = None
+        self.__next_status_at = None
+
+    @property
+    def is_open(self):
+        return self.__opened_at is not None
+
+    def open(self):
+        now = time.perf_counter()
+        self.__opened_at = now
+        self.__updated_at = now
+        self.__next_status_at = now
+        logger.info("Simulated drive started, cube is picked up in %.1fs", self.pickup_delay)
+
+    def close(self):
+        self.__opened_at = None
+        logger.info("Simulated drive stopped after %.0fmm", self.distance)
+
+    def write(self, data):
+        """Receive movement commands from the HNS."""
+        with self.__lock:
+            self._advance(time.perf_counter())
+            self.__received.extend(data)
+            frame = pop_frame(self.__received)
+            while len(frame) > 0:
+                speed, distance_ticks = struct.unpack("<BB", decode_frame(frame))
+                self.target_speed = speed * 100 / 255
+                self.distance_to_go = None
+                if distance_ticks > 0:
+                    self.distance_to_go = distance_ticks * MM_PER_DISTANCE_TICK
+                logger.info(
+                    "Received movement command: target speed %.1f%%, distance to go %s",
+                    self.target_speed, self.distance_to_go)
+                frame = pop_frame(self.__received)
+        return len(data)
+
+    def read(self, size=1):
+        """Send the status frames to the HNS, one every ``status_interval``."""
+        if not self.__pending:
+            delay = self.__next_status_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self.__next_status_at = max(
+                self.__next_status_at + self.status_interval, time.perf_counter())
+            with self.__lock:
+                self._advance(time.perf_counter())
+                self.__pending.extend(self._status_frame())
+
+        data = bytes(self.__pending[:size])
+        del self.__pending[:size]
+        return data
+
+    def _target_velocity(self):
+        """The speed in mm/s the drive accelerates or decelerates to."""
+        if self.distance_to_go is not None:
+            if self.distance_to_go <= 0:
+                return 0.0
+            speed = self.target_speed if self.target_speed > 0 else self.approach_speed
+            # brake in time to stop at the end of the distance to go
+            braking_speed = (2 * self.acceleration * self.distance_to_go) ** 0.5
+            return min(speed * self.mm_per_second_per_percent, braking_speed)
+        return self.target_speed * self.mm_per_second_per_percent
+
+    def _advance(self, now):
+        """Integrate speed and distance up to now."""
+        elapsed = now - self.__updated_at
+        self.__updated_at = now
+
+        target = self._target_velocity()
+        change = self.acceleration * elapsed
+        if self.speed < target:
+            speed = min(self.speed + change, target)
+        else:
+            speed = max(self.speed - change, target)
+        driven = (self.speed + speed) / 2 * elapsed
+        self.speed = speed
+        self.distance += driven
+
+        if self.distance_to_go is not None:
+            self.distance_to_go = max(self.distance_to_go - driven, 0.0)
+            if self.distance_to_go == 0.0:
+                self.speed = 0.0
+
+    def _status_frame(self):
+        status = 0
+        if time.perf_counter() - self.__opened_at >= self.pickup_delay:
+            status |= STATUS_CUBE_PICKED
+        speed = min(int(round(self.speed / 1000 * STATUS_SPEED_SCALE)), 255)
+        wheel_cycles = int(
+            self.distance / self.mm_per_wheel_cycle * STATUS_WHEEL_CYCLES_SCALE) % 0x10000
+        return encode_to_frame(struct.pack("<BbbHB", speed, 0, 0, wheel_cycles, status))
+
+
+def simulation_overrides(frames):
+    """Config overrides to replay the given frames as camera in real-time and in a loop."""
+    return {
+        "camera": {
+            "source": str(frames),
+            "replay_speed": "realtime",
+            "replay_loop": "yes",
+        },
+        "recorder": {
+            "enabled": "no",
+        },
+    }
+
+
+def attach_simulation(hns):
+    """Replace the serial port of the HNS with a simulated drive."""
+    drive = SimulatedDrive.from_config(
+        hns.config["simulation"],
+        mm_per_wheel_cycle=hns.config["distance-estimator"].getfloat("mm_per_wheel_cycle"))
+    hns.comm.communicator.uart = drive
+    return drive
+
+
+def report(timeline):
+    """Format the lap detection times, the INFO vote latency and the stop latency of a run."""
+    lines = ["Simulated run timeline:", timeline.format(), ""]
+
+    previous = timeline.get("cube picked")
+    for lap in range(1, 4):
+        passed = timeline.get("lap {}".format(lap))
+        if passed is None:
+            lines.append("lap {}: not detected".format(lap))
+            continue
+        lines.append("lap {}: detected after {:.3f}s (+{:.3f}s)".format(
+            lap, passed[0], passed[0] - previous[0] if previous else passed[0]))
+        previous = passed
+
+    vote = timeline.get("INFO vote")
+    if vote is not None:
+        lines.append("INFO vote latency: {:.3f}s".format(vote[1] - vote[0]))
+
+    sighted = timeline.get("stop signal sighted")
+    stopped = timeline.get("stop command")
+    if sighted is not None and stopped is not None:
+        lines.append("STOP signal sighting to stop command: {:.3f}s".format(
+            stopped[0] - sighted[0]))
+    else:
+        lines.append("STOP signal: not found")
+    return "\n".join(lines)
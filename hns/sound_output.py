@@ -1,4 +1,6 @@
 import time
+import queue
+import threading
 
 try:
     import RPi.GPIO as GPIO
@@ -16,6 +18,11 @@ logger = get_component_logger("Sound")
 
 
 class SoundOutput:
+    """
+    Sound output toggling the buzzer pin from Python.
+
+    All methods block until the sound is played.
+    """
     @classmethod
     def from_config(cls, config):
         logger.info(
@@ -39,6 +46,13 @@ class SoundOutput:
         self.interval = interval
         GPIO.setup(self.buzzer_pin, GPIO.OUT)
 
+    def buzz(self, pitch, duration):
+        """Buzz with the given pitch for the given duration."""
+        self._buzz(pitch, duration)
+
+    def wait(self):
+        """Wait until all sounds are played."""
+
     def output_number(self, number):
         # NOTE(TF): hack the first pitch, because the buzzer is stupid
         self._buzz(self.pitch - 300, self.pitch_duration)
@@ -64,3 +78,90 @@ class SoundOutput:
             time.sleep(delay)
             GPIO.output(self.buzzer_pin, False)
             time.sleep(delay)
+
+
+class PWMSoundOutput:
+    """
+    Sound output using the PWM of RPi.GPIO.
+
+    The square wave is generated outside of the Python interpreter,
+    a scheduler thread only wakes up to start and stop the tones.
+    All methods return immediately, use `wait()` to wait for the sounds.
+    """
+    @classmethod
+    def from_config(cls, config):
+        logger.info(
+            "Using PWMSoundOutput settings: "
+            "buzzer_pin=%s, pitch=%s, pitch_duration=%s, interval=%s",
+            config["buzzer_pin"],
+            config["pitch"],
+            config["pitch_duration"],
+            config["interval"],
+        )
+        buzzer_pin = config.getint("buzzer_pin")
+        pitch = config.getint("pitch")
+        pitch_duration = config.getfloat("pitch_duration")
+        interval = config.getfloat("interval")
+        return cls(buzzer_pin, pitch, pitch_duration, interval)
+
+    def __init__(self, buzzer_pin, pitch, pitch_duration, interval):
+        GPIO.setmode(GPIO.BCM)
+        self.buzzer_pin = buzzer_pin
+        self.pitch = pitch
+        self.pitch_duration = pitch_duration
+        self.interval = interval
+        GPIO.setup(self.buzzer_pin, GPIO.OUT)
+        self.__pwm = GPIO.PWM(self.buzzer_pin, self.pitch)
+
+        #: Holds the tones to play as (pitch, duration, pause) tuples
+        self.__tones = queue.Queue()
+        #: Holds the thread playing the scheduled tones
+        self.__player = threading.Thread(target=self._play_tones, name="sound_player")
+        self.__player.daemon = True
+        self.__player.start()
+
+    def buzz(self, pitch, duration):
+        """Schedule a buzz with the given pitch for the given duration."""
+        self.__tones.put((pitch, duration, 0))
+
+    def wait(self):
+        """Wait until all scheduled sounds are played."""
+        self.__tones.join()
+
+    def output_number(self, number):
+        """Schedule the tone sequence for the given number."""
+        # NOTE(TF): hack the first pitch, because the buzzer is stupid
+        self.__tones.put((self.pitch - 300, self.pitch_duration, self.interval))
+        for _ in range(number):
+            self.__tones.put((self.pitch, self.pitch_duration, self.interval))
+
+    def _play_tones(self):
+        while True:
+            pitch, duration, pause = self.__tones.get()
+            try:
+                if pitch != 0:
+                    self.__pwm.ChangeFrequency(pitch)
+                    # 50% duty cycle for a square wave
+                    self.__pwm.start(50)
+                time.sleep(duration)
+                self.__pwm.stop()
+                time.sleep(pause)
+            except Exception as exc:
+                logger.error("Failed to play tone: '%s'", str(exc))
+            finally:
+                self.__tones.task_done()
+
+
+def sound_output_from_config(config):
+    """Create the sound output selected by the ``backend`` setting.
+
+    The backend is either ``gpio`` to toggle the pin from Python
+    or ``pwm`` to use the PWM of RPi.GPIO.
+    """
+    backend = config.get("backend", "gpio")
+    if backend == "pwm":
+        return PWMSoundOutput.from_config(config)
+    if backend == "gpio":
+        return SoundOutput.from_config(config)
+
+    raise ValueError("Unsupported sound backend '{}', use gpio or pwm".format(backend))
@@ -0,0 +1,90 @@
+"""
+Temporal voting for the decision to stop at a STOP signal.
+
+A single misread digit must not stop the car at the wrong STOP signal.
+The `StopSignalVoter` accumulates the confidence of the digit detector
+for the digit to stop at over a sliding window of the recent frames and
+commits as soon as the accumulated evidence crosses a threshold.
+
+With hard votes every frame counts 1 if the arg max of the digit detector
+is the digit to stop at and 0 otherwise, so it's a k-of-n vote with k being
+the threshold and n the window. With a window of 1 and a threshold of 1
+it's a decision on the first frame like the arg max of the digit detector.
+"""
+
+from collections import deque
+
+import numpy as np
+
+from hns.logger import get_component_logger
+
+logger = get_component_logger("StopSignalVoter")
+
+
+class StopSignalVoter:
+    """
+    Accumulate the evidence for the STOP signal to stop at over the recent frames.
+
+    Args:
+        target (int): the digit of the STOP signal to stop at
+        window (int): the number of recent frames to accumulate the evidence over
+        threshold (float): the accumulated confidence to commit to stop
+        hard (bool): if the frames vote with the arg max instead of the confidence
+    """
+    @classmethod
+    def from_config(cls, target, config):
+        logger.info(
+            "Using StopSignalVoter settings: target=%d, window=%s, threshold=%s, hard=%s",
+            target, config.get("window", "3"), config.get("threshold", "1.5"),
+            config.get("hard", "no")
+        )
+        return cls(
+            target,
+            window=config.getint("window", 3),
+            threshold=config.getfloat("threshold", 1.5),
+            hard=config.getboolean("hard", False)
+        )
+
+    def __init__(self, target, window=3, threshold=1.5, hard=False):
+        self.target = target
+        self.window = window
+        self.threshold = threshold
+        self.hard = hard
+
+        #: Holds the confidences for the target of the recent frames
+        self.confidences = deque(maxlen=window)
+
+    def reset(self):
+        self.confidences.clear()
+
+    @property
+    def evidence(self):
+        """The accumulated confidence for the target over the window."""
+        return sum(self.confidences)
+
+    def update(self, probabilities=None):
+        """Add the next frame and check if the evidence is sufficient to stop.
+
+        Args:
+            probabilities (numpy.array): the softmax of the digit detector for the
+                STOP signal on the frame or ``None`` if there is no STOP signal on it
+
+        Returns:
+            bool: if the car should stop
+        """
+        confidence = 0.0
+        if probabilities is not None:
+            probabilities = np.ravel(probabilities)
+            if self.hard:
+                confidence = float(int(probabilities.argmax()) == self.target)
+            else:
+                confidence = float(probabilities[self.target])
+        self.confidences.append(confidence)
+
+        evidence = self.evidence
+        if evidence >= self.threshold:
+            logger.info(
+                "Commit to stop at %d with evidence %.2f >= %.2f over the last %d frames",
+                self.target, evidence, self.threshold, len(self.confidences))
+            return True
+        return False
@@ -0,0 +1,252 @@
+"""
+Parameter sweep of the signal detector settings.
+
+Every parameter point is evaluated on all frames of a recording in
+its own task, the tasks are spread across all cores. The hit-rate
+and the frame latency of every point are written to a CSV and the
+Pareto front of hit-rate vs. latency is reported.
+"""
+
+import csv
+import random
+import argparse
+import itertools
+import multiprocessing
+from pathlib import Path
+
+import numpy as np
+
+from hns.config import parse_config
+from hns.logger import get_component_logger
+from hns.replay import evaluate_frame, open_recording
+from hns.replay_camera import load_frames
+from hns.signal_detector import SignalDetector
+
+logger = get_component_logger("Sweep")
+
+#: Holds the signal detector settings which can be swept and their types
+PARAMETERS = {
+    "canny_threshold1": int,
+    "canny_threshold2": int,
+    "minimum_box_size": int,
+    "startsignal_match_confidence": float,
+    "box_min_width": int,
+    "box_max_width": int,
+    "box_min_height": int,
+    "box_max_height": int,
+    "box_min_ratio": float,
+    "box_max_ratio": float,
+    "candidate_engine": str,
+    "components_threshold": int,
+    "components_polarity": str,
+}
+
+#: Holds the detected signal columns of the evaluated frames
+SIGNALS = ("start_signal", "info_signal", "stop_signal")
+
+#: Holds the state of a sweep worker process
+_worker = {}
+
+
+def parse_parameter(definition):
+    """Parse a parameter definition.
+
+    Either a list of values ``name=1,2,3`` for a grid search
+    or a range ``name=1:3`` for a random search.
+
+    Returns:
+        tuple: the name and a list of values or a (low, high) range
+    """
+    name, _, values = definition.partition("=")
+    if name not in PARAMETERS:
+        raise ValueError("Unknown parameter '{}', use one of {}".format(
+            name, ", ".join(sorted(PARAMETERS))))
+    convert = PARAMETERS[name]
+    if ":" in values:
+        if convert is str:
+            raise ValueError("The values of parameter '{}' can only be listed".format(name))
+        low, high = values.split(":")
+        return name, (convert(low), convert(high))
+    return name, [convert(value) for value in values.split(",")]
+
+
+def grid_points(parameters):
+    """Return all combinations of the parameter values."""
+    names = sorted(parameters)
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(*(parameters[name] for name in names))
+    ]
+
+
+def random_points(parameters, count, seed=None):
+    """Return random points with uniformly drawn values from the parameter ranges."""
+    rng = random.Random(seed)
+    points = []
+    for _ in range(count):
+        point = {}
+        for name, (low, high) in parameters.items():
+            if PARAMETERS[name] is int:
+                point[name] = rng.randint(low, high)
+            else:
+                point[name] = round(rng.uniform(low, high), 3)
+        points.append(point)
+    return points
+
+
+def pareto_front(results, latency="p95_ms"):
+    """Return the results which are not dominated in hit-rate and latency."""
+    front = []
+    for result in results:
+        dominated = any(
+            other["hit_rate"] >= result["hit_rate"]
+            and other[latency] <= result[latency]
+            and (other["hit_rate"] > result["hit_rate"] or other[latency] < result[latency])
+            for other in results
+        )
+        if not dominated:
+            front.append(result)
+    return sorted(front, key=lambda result: result[latency])
+
+
+def load_labels(labels_path, names):
+    """Load the expected signals per frame from a CSV, e.g. a (corrected) replay result."""
+    with open(str(labels_path), newline="") as csvfile:
+        rows = {row["name"]: row for row in csv.DictReader(csvfile)}
+    return [
+        tuple(int(rows[name][signal]) for signal in SIGNALS) if name in rows else None
+        for name in names
+    ]
+
+
+def _init_sweep_worker(configfile, frames_path, labels):
+    _worker["config"] = parse_config(configfile, configure_logging=False)
+    _worker["frames"] = load_frames(frames_path)
+    _worker["labels"] = labels
+
+
+def evaluate_point(point):
+    """Evaluate a parameter point on all frames."""
+    config = _worker["config"]
+    for name, value in point.items():
+        config["signal-detector"][name] = str(value)
+    signal_detector = SignalDetector.from_config(config["signal-detector"])
+
+    latencies = []
+    detections = []
+    for frame in _worker["frames"]:
+        result = evaluate_frame(frame, signal_detector)
+        latencies.append(result["total_ms"])
+        detections.append(tuple(result[signal] for signal in SIGNALS))
+
+    expected = hits = false_alarms = 0
+    for detected, labels in zip(detections, _worker["labels"]):
+        if labels is None:
+            continue
+        for is_detected, is_expected in zip(detected, labels):
+            expected += is_expected
+            hits += is_detected and is_expected
+            false_alarms += is_detected and not is_expected
+
+    result = dict(point)
+    result.update({
+        "hit_rate": hits / expected if expected else 0.0,
+        "false_alarms": false_alarms,
+        "mean_ms": float(np.mean(latencies)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    })
+    return result
+
+
+def main(args):
+    """Entry point for ``python -m hns sweep``."""
+    parser = argparse.ArgumentParser(
+        prog="hns sweep",
+        description="Sweep the signal detector settings for hit-rate vs. latency")
+    parser.add_argument(
+        "source", metavar="FRAMES", type=Path,
+        help="Frame directory or packed .npy stack to evaluate on")
+    parser.add_argument(
+        "-p", "--param", action="append", default=[], metavar="NAME=VALUES",
+        help="Parameter values: a list 'name=1,2,3' for a grid or a range 'name=1:3' "
+             "for a random search. Can be given multiple times. "
+             "Parameters: " + ", ".join(sorted(PARAMETERS)))
+    parser.add_argument(
+        "-n", "--random", type=int, metavar="N",
+        help="Evaluate N random points from the parameter ranges")
+    parser.add_argument("--seed", type=int, help="Seed for the random search")
+    parser.add_argument(
+        "-l", "--labels", type=Path,
+        help="CSV with the expected signals per frame, e.g. a corrected replay result. "
+             "Defaults to the detections with the unmodified config.")
+    parser.add_argument(
+        "--latency", choices=("mean", "p95"), default="p95",
+        help="The frame latency for the Pareto front")
+    parser.add_argument(
+        "-c", "--config", type=Path,
+        default=Path(__file__).parent / "../configs/stable.ini",
+        help="Path to the configuration file")
+    parser.add_argument(
+        "-w", "--workers", type=int, default=None,
+        help="Number of worker processes, defaults to the number of cores")
+    parser.add_argument(
+        "-o", "--output", type=Path, default=Path("sweep.csv"),
+        help="Path to the results of all points")
+    args = parser.parse_args(args)
+
+    parameters = dict(parse_parameter(definition) for definition in args.param)
+    if not parameters:
+        parser.error("at least one --param is required")
+    if args.random:
+        if any(isinstance(values, list) for values in parameters.values()):
+            parser.error("a random search requires ranges 'name=low:high'")
+        points = random_points(parameters, args.random, args.seed)
+    else:
+        if any(isinstance(values, tuple) for values in parameters.values()):
+            parser.error("ranges 'name=low:high' require --random")
+        points = grid_points(parameters)
+
+    parse_config(args.config)
+    frames, names, frames_path = open_recording(args.source)
+
+    baseline = None
+    if args.labels is not None:
+        labels = load_labels(args.labels, names)
+    else:
+        # the detections of the unmodified config are the reference
+        _init_sweep_worker(args.config, frames_path, [None] * len(frames))
+        signal_detector = SignalDetector.from_config(_worker["config"]["signal-detector"])
+        labels = []
+        for frame in frames:
+            result = evaluate_frame(frame, signal_detector)
+            labels.append(tuple(result[signal] for signal in SIGNALS))
+        baseline = sum(map(sum, labels))
+
+    logger.info(
+        "Sweeping %d points on %d frames (%s expected signals)",
+        len(points), len(frames),
+        baseline if baseline is not None else "labelled")
+
+    with multiprocessing.Pool(
+            processes=args.workers, initializer=_init_sweep_worker,
+            initargs=(str(args.config), str(frames_path), labels)) as pool:
+        results = []
+        for result in pool.imap_unordered(evaluate_point, points):
+            logger.info("Evaluated %s", result)
+            results.append(result)
+
+    front = pareto_front(results, latency=args.latency + "_ms")
+    columns = sorted(parameters) + ["hit_rate", "false_alarms", "mean_ms", "p95_ms", "pareto"]
+    with open(str(args.output), "w", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=columns)
+        writer.writeheader()
+        for result in results:
+            writer.writerow(dict(result, pareto=int(result in front)))
+
+    logger.info("Pareto front of hit-rate vs. %s frame latency:", args.latency)
+    for result in front:
+        logger.info(
+            "  hit-rate=%.3f false alarms=%d mean=%.3fms p95=%.3fms: %s",
+            result["hit_rate"], result["false_alarms"], result["mean_ms"], result["p95_ms"],
+            ", ".join("{}={}".format(name, result[name]) for name in sorted(parameters)))
+    logger.info("Results at: %s", str(args.output))
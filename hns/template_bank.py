@@ -0,0 +1,156 @@
+"""
+Bank of START signal templates matched by their H-S histograms.
+
+The START signal is recognized by comparing the hue-saturation histogram
+of image windows with the histogram of a template image. A single template
+doesn't cover all lighting conditions, the `TemplateBank` holds the
+histograms of several templates at several scales, the scale sets the size
+of the windows compared with the template.
+
+Reading, resizing and histogramming the templates in every process creating
+a signal detector is avoided with a cache file of the histograms. It's keyed
+by a hash of the template files, the scales and the histogram settings, so
+changing any of them recomputes the histograms.
+"""
+
+import os
+import hashlib
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from hns.logger import get_component_logger
+
+logger = get_component_logger("TemplateBank")
+
+#: Holds the size of a template at scale 1 in pixel
+TEMPLATE_SIZE = 30
+#: Holds the number of hue and saturation bins of the histograms
+HIST_SIZE = (45, 32)
+#: Holds the ranges of hue and saturation of the histograms
+HIST_RANGES = (0, 180, 0, 256)
+#: Holds the version of the cache file, part of its key
+CACHE_VERSION = 1
+
+
+def hs_histogram(image_hsv):
+    """The H-S histogram of a HSV image, normalized to the range 0-1."""
+    histogram = cv2.calcHist(
+        [image_hsv], channels=[0, 1], mask=None,
+        histSize=list(HIST_SIZE), ranges=list(HIST_RANGES))
+    cv2.normalize(histogram, histogram, alpha=0, beta=1, norm_type=cv2.NORM_MINMAX)
+    return histogram
+
+
+def _cache_key(paths, scales):
+    digest = hashlib.sha1()
+    digest.update(repr((CACHE_VERSION, TEMPLATE_SIZE, HIST_SIZE, HIST_RANGES)).encode())
+    for path in paths:
+        with open(str(path), "rb") as template_file:
+            digest.update(hashlib.sha1(template_file.read()).digest())
+    digest.update(repr(tuple(scales)).encode())
+    return digest.hexdigest()
+
+
+class TemplateBank:
+    """
+    Histograms of templates at different scales, compared with windows at once.
+
+    Args:
+        histograms (numpy.array): the flattened histograms of the templates, one per row
+        window_sizes (numpy.array): the size of the windows to compare with each template
+        names (list): the names of the templates, e.g. ``startsignal_v3.jpg@1.0``
+    """
+    @classmethod
+    def from_files(cls, paths, scales=(1.0,), cache_path=None):
+        """Create the bank from template images, the histograms are cached if a path is given."""
+        paths = [Path(path) for path in paths]
+        key = _cache_key(paths, scales)
+        if cache_path is not None and Path(cache_path).exists():
+            try:
+                with np.load(str(cache_path)) as cache:
+                    if str(cache["key"]) == key:
+                        logger.info("Using cached template histograms from %s", cache_path)
+                        return cls(
+                            cache["histograms"], cache["window_sizes"], list(cache["names"]))
+                logger.info("Template histograms in %s are outdated", cache_path)
+            except (OSError, ValueError, KeyError) as exc:
+                logger.warning("Can't read template histograms from %s: '%s'", cache_path, exc)
+
+        histograms, window_sizes, names = [], [], []
+        for path in paths:
+            template = cv2.imread(str(path))
+            if template is None:
+                raise ValueError("Can't read template {}".format(path))
+            for scale in scales:
+                size = int(round(TEMPLATE_SIZE * scale))
+                template_hsv = cv2.cvtColor(cv2.resize(template, (size, size)), cv2.COLOR_BGR2HSV)
+                histograms.append(hs_histogram(template_hsv).ravel())
+                window_sizes.append(size)
+                names.append("{}@{}".format(path.name, scale))
+        bank = cls(np.array(histograms), np.array(window_sizes), names)
+        if cache_path is not None:
+            try:
+                bank.save(cache_path, key)
+            except OSError as exc:
+                # e.g. a read-only installation, the histograms are computed every time
+                logger.warning("Can't cache template histograms at %s: '%s'", cache_path, exc)
+        return bank
+
+    def __init__(self, histograms, window_sizes, names):
+        self.histograms = np.asarray(histograms, dtype=np.float32)
+        self.window_sizes = np.asarray(window_sizes)
+        self.names = names
+
+        # Bhattacharyya coefficients are sums of sqrt(h1 * h2), the template part is precomputed
+        sqrt_histograms = np.sqrt(self.histograms.astype(np.float64))
+        sums = self.histograms.sum(axis=1, dtype=np.float64)
+        #: Holds the square roots and the sums of the histograms of the templates per window size
+        self._by_window_size = {
+            int(size): (sqrt_histograms[self.window_sizes == size],
+                        sums[self.window_sizes == size])
+            for size in np.unique(self.window_sizes)
+        }
+
+    def __len__(self):
+        return len(self.names)
+
+    def save(self, path, key):
+        """Save the histograms into a cache file, it's replaced at once."""
+        path = Path(path)
+        handle, temporary = tempfile.mkstemp(dir=str(path.parent), prefix=path.name)
+        with os.fdopen(handle, "wb") as cache_file:
+            np.savez(
+                cache_file, key=key, histograms=self.histograms,
+                window_sizes=self.window_sizes, names=np.array(self.names))
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, str(path))
+        logger.info("Cached %d template histograms at %s", len(self), path)
+
+    @property
+    def sizes(self):
+        """The window sizes of the templates, from the smallest to the largest."""
+        return sorted(self._by_window_size)
+
+    def distances(self, histograms, window_size):
+        """The smallest Bhattacharyya distances of window histograms to the templates of their size.
+
+        The distances are the same as ``cv2.compareHist`` with ``cv2.HISTCMP_BHATTACHARYYA``,
+        but the histograms of many windows are compared with all templates at once.
+
+        Args:
+            histograms (numpy.array): the flattened histograms of the windows, one per row
+            window_size (int): the size of the windows
+
+        Returns:
+            numpy.array: the distance of each window to its closest template
+        """
+        sqrt_histograms, sums = self._by_window_size[window_size]
+        histograms = np.asarray(histograms, dtype=np.float64)
+        coefficients = np.sqrt(histograms) @ sqrt_histograms.T
+        normalization = np.sqrt(np.outer(histograms.sum(axis=1), sums))
+        normalization[normalization <= np.finfo(np.float32).eps] = 1.0
+        distances = np.sqrt(np.maximum(1.0 - coefficients / normalization, 0.0))
+        return distances.min(axis=1)
@@ -0,0 +1,199 @@
+"""
+Timeline tracing of the frames through all HNS processes and threads.
+
+Spans of the pipeline stages are recorded with the sequence number of the
+frame they process and written in the Trace Event Format, which the trace
+viewers of Chrome (``chrome://tracing``) and Perfetto (https://ui.perfetto.dev)
+show as a timeline per process and thread. The spans of a frame are linked
+by flow arrows from its capture to every stage processing it, so queueing
+delays show up as gaps and idle cores as empty tracks.
+
+Once started with `start_tracing`, every process forked by multiprocessing,
+like the INFO signal workers, traces itself, too. Each process appends its
+events to ``<directory>/<process name>-<pid>.trace.json`` every second, the
+files of all processes are merged with `merge_traces` into a single trace.
+Without tracing a span costs a single check.
+"""
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from multiprocessing import current_process, util
+
+from hns.logger import get_component_logger
+
+logger = get_component_logger("Tracer")
+
+#: Holds the time between two writes of the events in s,
+#: terminated pool workers don't get the chance to write them at exit
+FLUSH_INTERVAL = 1.0
+#: Holds the category of the flow events linking the spans of a frame
+FRAME_CATEGORY = "frame"
+
+#: Holds the tracer of the current process
+_tracer = None
+
+
+def _now_us():
+    # the wall clock is the same in all processes and is the clock of the frame timestamps
+    return time.time() * 1e6
+
+
+class Tracer:
+    """
+    Record the spans of the current process and append them to its trace file.
+
+    The file is a trace in the JSON array format without the closing bracket,
+    which the Trace Event Format allows for traces of crashed processes.
+
+    Args:
+        directory (str, pathlib.Path): the directory to write the trace to
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.pid = os.getpid()
+        #: Holds the path of the trace of this process
+        self.path = self.directory / "{}-{}.trace.json".format(current_process().name, self.pid)
+
+        #: Holds the recorded events, which aren't written yet
+        self.events = []
+        #: Holds the thread ids, which have their names recorded already
+        self._named_threads = set()
+        #: Holds the event to stop writing
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._write_until_stopped, name="Tracer")
+        self._thread.daemon = True
+
+    def start(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(str(self.path), "w") as trace_file:
+            trace_file.write("[\n")
+        self.events.append({
+            "name": "process_name", "ph": "M", "pid": self.pid, "tid": 0,
+            "args": {"name": current_process().name},
+        })
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+        self.write()
+
+    def complete(self, name, start, end, seq=None, args=None):
+        """Record a span of the current thread from start to end in us."""
+        tid = threading.get_ident()
+        if tid not in self._named_threads:
+            self._named_threads.add(tid)
+            self.events.append({
+                "name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid,
+                "args": {"name": threading.current_thread().name},
+            })
+
+        args = dict(args or {})
+        if seq is not None:
+            args["seq"] = seq
+        self.events.append({
+            "name": name, "cat": "hns", "ph": "X", "ts": start, "dur": end - start,
+            "pid": self.pid, "tid": tid, "args": args,
+        })
+
+    def flow(self, seq, timestamp, start=False):
+        """Link the span of the current thread at the timestamp to the other spans of the frame.
+
+        The flow of a frame starts at its capture and steps through every span processing it.
+        """
+        self.events.append({
+            "name": "frame", "cat": FRAME_CATEGORY, "ph": "s" if start else "t",
+            "id": seq, "ts": timestamp, "pid": self.pid, "tid": threading.get_ident(),
+            "bp": "e",
+        })
+
+    def write(self):
+        """Append the recorded events to the trace file."""
+        # NOTE: events recorded concurrently are appended to the old list, which is written
+        events, self.events = self.events, []
+        if not events:
+            return
+        with open(str(self.path), "a") as trace_file:
+            for event in events:
+                trace_file.write(json.dumps(event))
+                trace_file.write(",\n")
+
+    def _write_until_stopped(self):
+        while not self._stop_event.wait(FLUSH_INTERVAL):
+            self.write()
+
+
+@contextmanager
+def span(name, seq=None, capture=False, **args):
+    """Trace the with block as span, if tracing is started.
+
+    Args:
+        name (str): the name of the span, like the names of the metrics
+        seq (int): the sequence number of the processed frame
+        capture (bool): the span captures the frame and starts its flow
+        args: further arguments to show with the span
+    """
+    tracer = _tracer
+    if tracer is None:
+        yield
+        return
+
+    start = _now_us()
+    try:
+        yield
+    finally:
+        end = _now_us()
+        tracer.complete(name, start, end, seq, args)
+        if seq is not None:
+            tracer.flow(seq, start, start=capture)
+
+
+def start_tracing(directory):
+    """Trace the current process and every process forked by multiprocessing from now on."""
+    global _tracer
+    _tracer = Tracer(directory)
+    _tracer.start()
+    util.register_after_fork(_tracer, _trace_child)
+    logger.info("Tracing into %s", str(_tracer.path))
+
+
+def stop_tracing():
+    """Stop tracing the current process and write its remaining events."""
+    global _tracer
+    if _tracer is not None:
+        tracer, _tracer = _tracer, None
+        tracer.stop()
+        logger.info("Wrote the trace to %s", str(tracer.path))
+
+
+def _trace_child(parent_tracer):
+    # the events of the parent were recorded before the fork and are written by the parent
+    start_tracing(parent_tracer.directory)
+    # written on a regular exit of the process, e.g. the Manager on shutdown
+    util.Finalize(_tracer, stop_tracing, exitpriority=1)
+
+
+def read_trace(path):
+    """Read the events of a trace file, the closing bracket may be missing."""
+    with open(str(path)) as trace_file:
+        content = trace_file.read().rstrip().rstrip(",")
+    if not content.endswith("]"):
+        content += "]"
+    return json.loads(content)
+
+
+def merge_traces(directory):
+    """Merge the traces of all processes traced into the given directory.
+
+    Returns:
+        dict: the trace in the JSON object format of the Trace Event Format
+    """
+    events = []
+    for path in sorted(Path(directory).glob("*.trace.json")):
+        events.extend(read_trace(path))
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
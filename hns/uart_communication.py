@@ -1,8 +1,8 @@
-import serial
 import threading
 import struct
 import collections
 from operator import xor
+from hns import tracing
 from hns.logger import get_component_logger
 
 
@@ -72,7 +72,8 @@ class UartRunner:
         while not self.stop_event.is_set():
             if self.new_data_to_send_event.is_set():
                 self.new_data_to_send_event.clear()
-                self.communicator.write()
+                with tracing.span("UartCommunication::write"):
+                    self.communicator.write()
             self.new_data_to_send_event.wait()
 
     def _read_task(self):
@@ -97,6 +98,7 @@ class UartCommunicator:
     def open(self):
         self.logger.info("Open serial port")
         if self.uart is None:
+            import serial
             self.uart = serial.Serial(
                 port="/dev/serial0",
                 baudrate=115200,
@@ -3,15 +3,74 @@ Misc util functionality for HNS.
 """
 
 import time
+import logging
+import threading
 from contextlib import contextmanager
 
+from hns import metrics
+
 
 @contextmanager
 def timeit(logger, what):
-    start = time.time()
+    start = metrics.perf_counter_ns()
     yield
-    duration = time.time() - start
-    logger.debug("%s: took %f secs", what, duration)
+    duration = metrics.perf_counter_ns() - start
+    metrics.registry.record(what, duration)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%s: took %f secs", what, duration / 1e9)
+
+
+class Timeline:
+    """
+    Record the start and end of named phases relative to the creation of the timeline.
+
+    Phases may run concurrently in different threads.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases = []
+        self.__lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self.__lock:
+                self.phases.append((name, start - self.started_at, end - self.started_at))
+
+    def mark(self, name, ago=0.0):
+        """Record an event, which happened the given seconds ago, as phase without duration."""
+        now = time.perf_counter() - ago - self.started_at
+        with self.__lock:
+            self.phases.append((name, now, now))
+
+    def get(self, name):
+        """Return the start and end of the first phase with the given name or ``None``."""
+        for phase_name, start, end in self.phases:
+            if phase_name == name:
+                return start, end
+        return None
+
+    def timed(self, name, func):
+        """Wrap the given function to record its calls as phase."""
+        def _timed(*args, **kwargs):
+            with self.phase(name):
+                return func(*args, **kwargs)
+        return _timed
+
+    def elapsed(self):
+        return time.perf_counter() - self.started_at
+
+    def format(self):
+        """Format the recorded phases ordered by their start."""
+        lines = []
+        for name, start, end in sorted(self.phases, key=lambda phase: phase[1]):
+            lines.append("{:7.3f}s - {:7.3f}s ({:6.3f}s) {}".format(start, end, end - start, name))
+        return "\n".join(lines)
 
 
 def debug_image(image, title="Debug image", cmap="gray"):
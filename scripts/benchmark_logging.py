@@ -0,0 +1,97 @@
+#!/usr/bin/python3
+
+"""
+Benchmark the main loop iteration time with direct and queued logging.
+
+Run it once in a terminal and once with the output redirected
+to compare the effect of a slow terminal:
+
+    benchmark_logging.py
+    benchmark_logging.py > /dev/null
+
+A slow terminal, like a serial console, can be simulated with a throttled output:
+
+    benchmark_logging.py --throttle 11520
+"""
+
+import sys
+import time
+import logging
+import argparse
+from pathlib import Path
+
+import cv2
+
+from hns.config import parse_config
+from hns.logger import get_component_logger, start_queue_logging, stop_queue_logging
+from hns.metrics import Histogram, perf_counter_ns
+from hns.signal_detector import SignalDetector, SignalType
+
+ROOT_DIR = Path(__file__).parent / ".."
+IMAGE_DIR = ROOT_DIR / "tests/images/track"
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+parser.add_argument("--iterations", type=int, default=2000)
+parser.add_argument(
+    "--throttle", type=int, metavar="BYTES_PER_SEC",
+    help="Simulate a slow terminal with the given throughput")
+args = parser.parse_args()
+ITERATIONS = args.iterations
+
+
+class ThrottledStream:
+    """Stream blocking for the time a slow terminal needs for the written data."""
+
+    def __init__(self, stream, bytes_per_sec):
+        self.stream = stream
+        self.bytes_per_sec = bytes_per_sec
+
+    def write(self, data):
+        time.sleep(len(data) / self.bytes_per_sec)
+        return self.stream.write(data)
+
+    def flush(self):
+        self.stream.flush()
+
+
+config = parse_config(ROOT_DIR / "configs/stable.ini")
+if args.throttle:
+    for handler in logging.getLogger("hns").handlers:
+        handler.stream = ThrottledStream(handler.stream, args.throttle)
+logger = get_component_logger("HNS")
+signal_detector = SignalDetector.from_config(config["signal-detector"])
+frames = [
+    signal_detector.crop_image(cv2.imread(str(path)), [SignalType.START_SIGNAL])
+    for path in sorted(IMAGE_DIR.glob("frame-*.jpg"))[:100]
+]
+
+
+def run():
+    """Run an iteration of the lap loop with a log line per frame."""
+    histogram = Histogram()
+    for iteration in range(ITERATIONS):
+        start = perf_counter_ns()
+        signal_detector.detect(frames[iteration % len(frames)], [SignalType.START_SIGNAL])
+        logger.info("Dropping frame because no signal detected")
+        histogram.record(perf_counter_ns() - start)
+    return histogram
+
+
+def report(mode, histogram):
+    # stderr, so that the report is visible when stdout is redirected
+    print(
+        "{} logging (terminal attached: {}, throttle: {}): "
+        "mean={:.3f}ms p99={:.3f}ms max={:.3f}ms".format(
+            mode, sys.stdout.isatty(), args.throttle, histogram.mean / 1e6,
+            histogram.percentile(99) / 1e6, histogram.max / 1e6),
+        file=sys.stderr)
+
+
+direct = run()
+
+start_queue_logging()
+queued = run()
+stop_queue_logging()
+
+report("direct", direct)
+report("queued", queued)
@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+
+"""
+Benchmark the signal detection on BGR frames against YUV frames.
+
+The frames from the track image set are converted to the raw I420
+buffers the camera delivers in the ``yuv`` format, so that the
+YUV path includes the wrapping of the camera buffer.
+"""
+
+import sys
+import time
+import logging
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from hns.config import parse_config
+from hns.models import YUVImage
+from hns.signal_detector import SignalDetector, SignalType
+
+logging.basicConfig(level=logging.INFO)
+
+ROOT_DIR = Path(__file__).parent / ".."
+IMAGE_DIR = Path(sys.argv[1]) if len(sys.argv) > 1 else ROOT_DIR / "tests/images/track"
+
+config = parse_config(ROOT_DIR / "configs/stable.ini")
+# do not measure the logging
+logging.getLogger("hns").setLevel(logging.WARNING)
+
+resolution = tuple(int(x) for x in config["camera"]["resolution"].split("x"))
+signal_detector = SignalDetector.from_config(config["signal-detector"])
+
+frames = []
+for frame_path in sorted(IMAGE_DIR.glob("frame-*.jpg")):
+    frame = cv2.imread(str(frame_path))
+    if frame.shape[1::-1] != resolution:
+        frame = cv2.resize(frame, resolution)
+    # keep the raw buffers like the camera delivers them
+    frames.append((frame.tobytes(), YUVImage.from_bgr(frame).to_i420()))
+
+logging.info("Benchmarking %d frames at %dx%d", len(frames), *resolution)
+
+workloads = (
+    ("start", [SignalType.START_SIGNAL]),
+    ("info", [SignalType.INFO_SIGNAL]),
+    ("stop", [SignalType.STOP_SIGNAL]),
+)
+
+
+def run(prepare, signal_types):
+    detected = 0
+    start = time.perf_counter()
+    for frame in frames:
+        image = prepare(frame)
+        if signal_detector.crop_and_detect(image, signal_types=signal_types) is not None:
+            detected += 1
+    return (time.perf_counter() - start) / len(frames), detected
+
+
+for workload, signal_types in workloads:
+    for name, prepare in (
+            ("bgr", lambda frame: np.frombuffer(frame[0], dtype=np.uint8).reshape(
+                (resolution[1], resolution[0], 3))),
+            ("yuv", lambda frame: YUVImage.from_buffer(frame[1], resolution))):
+        duration, detected = run(prepare, signal_types)
+        logging.info(
+            "%s signals from %s frames: %.3f ms per frame, %d signals detected",
+            workload, name, duration * 1000, detected)
@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+
+"""
+Evaluate the window and threshold of the StopSignalVoter on replayed approaches.
+
+The replay results (``python -m hns replay``) contain the softmax of the digit
+detector for every STOP signal. Consecutive frames with a digit on a STOP signal
+form the approach to a signal. Its digit is the majority of the detected digits,
+or of the ``stop_digit`` of a labels CSV, e.g. a corrected replay result.
+
+For every approach and every digit 1-9 the voter decides frame by frame:
+committing on the digit of the approach is a hit, its latency is counted in
+frames from the first frame of the approach, committing on any other digit
+is a wrong stop.
+
+Usage: evaluate_stop_voting.py REPLAY_CSV [LABELS_CSV]
+"""
+
+import sys
+import csv
+import itertools
+from collections import Counter
+
+from hns.stop_signal_voter import StopSignalVoter
+
+#: Holds the maximum number of frames without a digit on a STOP signal within an approach
+MAX_GAP = 5
+#: Holds the frame rate of the camera to convert frames to ms
+FPS = 30
+
+WINDOWS = (1, 2, 3, 4, 5, 8)
+THRESHOLDS = (0.5, 1.0, 1.5, 2.0, 2.5, 3.0)
+
+
+def read_rows(path):
+    with open(path, newline="") as csvfile:
+        return list(csv.DictReader(csvfile))
+
+
+def find_approaches(rows, labels=None):
+    """Group the frames with a digit on a STOP signal into approaches to a STOP signal.
+
+    Returns:
+        list: ``(first, last, digit)`` frame indices and the digit of each approach
+    """
+    source = labels if labels is not None else rows
+    approaches = []
+    first = last = None
+    digits = Counter()
+    for index, row in enumerate(source):
+        digit = int(row["stop_digit"])
+        if not digit:
+            continue
+        if last is not None and index - last > MAX_GAP:
+            approaches.append((first, last, digits.most_common(1)[0][0]))
+            first = None
+            digits = Counter()
+        if first is None:
+            first = index
+        last = index
+        digits[digit] += 1
+    if first is not None:
+        approaches.append((first, last, digits.most_common(1)[0][0]))
+    return approaches
+
+
+def probabilities(row):
+    if not int(row["stop_signal"]):
+        return None
+    return [float(row["stop_p{}".format(digit)]) for digit in range(10)]
+
+
+def evaluate(rows, approaches, window, threshold):
+    """Evaluate the voter with the given window and threshold on all approaches."""
+    hits = misses = wrong_stops = 0
+    latencies = []
+    for (first, last, digit), target in itertools.product(approaches, range(1, 10)):
+        voter = StopSignalVoter(target, window=window, threshold=threshold)
+        committed_at = None
+        for index in range(first, last + 1):
+            if voter.update(probabilities(rows[index])):
+                committed_at = index
+                break
+
+        if target != digit:
+            wrong_stops += committed_at is not None
+        elif committed_at is None:
+            misses += 1
+        else:
+            hits += 1
+            latencies.append(committed_at - first)
+    return hits, misses, wrong_stops, latencies
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    rows = read_rows(sys.argv[1])
+    labels = None
+    if len(sys.argv) > 2:
+        labels_by_name = {row["name"]: row for row in read_rows(sys.argv[2])}
+        labels = [labels_by_name[row["name"]] for row in rows]
+
+    approaches = find_approaches(rows, labels)
+    print("{} approaches to STOP signals: {}".format(
+        len(approaches), ", ".join(str(digit) for _, _, digit in approaches)))
+    print("window threshold  hits misses wrong_stops mean_latency")
+    for window, threshold in itertools.product(WINDOWS, THRESHOLDS):
+        if threshold > window:
+            continue
+        hits, misses, wrong_stops, latencies = evaluate(rows, approaches, window, threshold)
+        latency = sum(latencies) / len(latencies) if latencies else float("nan")
+        print("{:6d} {:9.1f} {:5d} {:6d} {:11d} {:6.2f} frames ({:.0f}ms)".format(
+            window, threshold, hits, misses, wrong_stops, latency, latency * 1000 / FPS))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+#!/usr/bin/python3
+
+"""
+Measure the CPU time the sound backends take to output a number.
+
+The CPU time is measured for the whole process while
+the 9-beep sequence is played, like during the STOP signal phase.
+"""
+
+import sys
+import time
+import logging
+from pathlib import Path
+
+from hns.config import parse_config
+from hns.sound_output import SoundOutput, PWMSoundOutput
+
+logging.basicConfig(level=logging.INFO)
+
+ROOT_DIR = Path(__file__).parent / ".."
+NUMBER = int(sys.argv[1]) if len(sys.argv) > 1 else 9
+
+config = parse_config(ROOT_DIR / "configs/stable.ini")
+
+for backend in (SoundOutput, PWMSoundOutput):
+    sound = backend.from_config(config["sound"])
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    sound.output_number(NUMBER)
+    returned_after = time.perf_counter() - wall_start
+    sound.wait()
+    wall_time = time.perf_counter() - wall_start
+    cpu_time = time.process_time() - cpu_start
+
+    logging.info(
+        "%s: output_number(%d) returned after %.3fs, played in %.3fs, "
+        "used %.3fs CPU (%.1f%% of one core)",
+        backend.__name__, NUMBER, returned_after, wall_time,
+        cpu_time, cpu_time / wall_time * 100)
@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+
+"""
+Measure the memory of the INFO signal worker processes with each backend of the digit detector.
+
+A pool of workers creates its digit detector like a warmed up
+AsyncInfosignalDetector and predicts a crop once. Each worker reports its
+resident memory from ``/proc/self/status``: ``RssAnon`` is private to the
+worker, ``RssFile`` are pages of files like the memory-mapped weights,
+which are shared with all other workers through the page cache.
+
+Usage: measure_worker_memory.py [NUMBER_OF_WORKERS] [BACKEND ...]
+"""
+
+import sys
+import logging
+import threading
+import multiprocessing
+from pathlib import Path
+
+import numpy as np
+
+from hns.config import parse_config
+from hns.digit_detector import DigitDetector
+
+logging.basicConfig(level=logging.INFO)
+
+ROOT_DIR = Path(__file__).parent / ".."
+FIELDS = ("VmRSS", "RssAnon", "RssFile")
+
+
+def memory_status():
+    """The resident memory of this process in kB."""
+    status = {}
+    with open("/proc/self/status") as status_file:
+        for line in status_file:
+            name, _, value = line.partition(":")
+            if name in FIELDS:
+                status[name] = int(value.split()[0])
+    return status
+
+
+def measure_worker(config, backend, barrier):
+    digit_detector = DigitDetector.from_config(dict(config, backend=backend))
+    digit_detector.predict(np.random.randint(0, 256, (50, 30), dtype=np.uint8))
+    status = memory_status()
+    # keep every worker busy until all are measured, so that each one runs exactly once
+    barrier.wait()
+    return status
+
+
+def measure(config, backend, number_of_workers):
+    # NOTE: the detector isn't created in a pool initializer,
+    #       the pool would restart failing workers forever, e.g. without keras.
+    with multiprocessing.Manager() as manager, \
+            multiprocessing.Pool(processes=number_of_workers) as pool:
+        barrier = manager.Barrier(number_of_workers, timeout=60)
+        results = [
+            pool.apply_async(measure_worker, (config, backend, barrier))
+            for _ in range(number_of_workers)
+        ]
+        return [result.get() for result in results]
+
+
+def main():
+    number_of_workers = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    backends = sys.argv[2:] or DigitDetector.BACKENDS
+    config = parse_config(ROOT_DIR / "configs/stable.ini")
+    config = dict(config["digit-detector"])
+    logging.getLogger("hns").setLevel(logging.WARNING)
+
+    logging.info("Main process before the workers: %s", memory_status())
+    for backend in backends:
+        try:
+            statuses = measure(config, backend, number_of_workers)
+        except (ImportError, threading.BrokenBarrierError) as exc:
+            logging.warning("Skipping backend %s: %s", backend, exc)
+            continue
+        for worker, status in enumerate(statuses):
+            logging.info(
+                "%s worker %d: VmRSS %d kB, RssAnon %d kB, RssFile %d kB",
+                backend, worker, status["VmRSS"], status["RssAnon"], status["RssFile"])
+        logging.info(
+            "%s: %d kB private memory for %d workers",
+            backend, sum(status["RssAnon"] for status in statuses), number_of_workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/python3
+
+"""
+Merge the collapsed stacks of all processes profiled with ``--profile`` into one file.
+
+The merged file is the input of ``flamegraph.pl`` of the FlameGraph tools
+or can be opened with https://www.speedscope.app. The functions with the
+most samples on top of the stack are listed, too.
+
+Usage: merge_profiles.py DIRECTORY [OUTPUT]
+"""
+
+import sys
+from pathlib import Path
+from collections import Counter
+
+from hns.profiler import merge_profiles, write_collapsed
+
+#: Holds the number of functions to list
+TOP = 20
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    directory = Path(sys.argv[1])
+    output = Path(sys.argv[2]) if len(sys.argv) > 2 else directory / "merged.txt"
+    stacks = merge_profiles(directory)
+    write_collapsed(stacks, output)
+
+    # the process and the thread are the first two frames of each stack
+    processes = Counter()
+    functions = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        processes[frames[0]] += count
+        if len(frames) > 2:
+            functions[frames[-1]] += count
+
+    total = sum(stacks.values())
+    print("{} samples of {} processes merged into {}".format(total, len(processes), output))
+    print("Functions on top of the stack:")
+    for function, count in functions.most_common(TOP):
+        print("  {:6.1f}% {}".format(100 * count / total, function))
+
+
+if __name__ == "__main__":
+    main()
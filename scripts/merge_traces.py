@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+
+"""
+Merge the traces of all processes traced with ``--trace`` into one trace.
+
+The merged trace can be opened with ``chrome://tracing`` or https://ui.perfetto.dev.
+For every span the mean duration and the mean delay from the capture of
+its frame to the start of the span are listed, the queueing delay.
+
+Usage: merge_traces.py DIRECTORY [OUTPUT]
+"""
+
+import sys
+import json
+from pathlib import Path
+from collections import defaultdict
+
+from hns.tracing import FRAME_CATEGORY, merge_traces
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    directory = Path(sys.argv[1])
+    output = Path(sys.argv[2]) if len(sys.argv) > 2 else directory / "trace.json"
+    trace = merge_traces(directory)
+    with open(str(output), "w") as trace_file:
+        json.dump(trace, trace_file)
+
+    events = trace["traceEvents"]
+    captured_at = {
+        event["id"]: event["ts"] for event in events
+        if event.get("cat") == FRAME_CATEGORY and event["ph"] == "s"
+    }
+    durations = defaultdict(list)
+    delays = defaultdict(list)
+    for event in events:
+        if event["ph"] != "X":
+            continue
+        durations[event["name"]].append(event["dur"])
+        seq = event["args"].get("seq")
+        if seq in captured_at:
+            delays[event["name"]].append(event["ts"] - captured_at[seq])
+
+    print("{} events of {} frames merged into {}".format(len(events), len(captured_at), output))
+    print("{:45} {:>7} {:>12} {:>20}".format("span", "count", "mean [ms]", "since capture [ms]"))
+    for name, span_durations in sorted(durations.items()):
+        span_delays = delays.get(name)
+        print("{:45} {:7d} {:12.3f} {:>20}".format(
+            name, len(span_durations), sum(span_durations) / len(span_durations) / 1000,
+            "{:.3f}".format(sum(span_delays) / len(span_delays) / 1000) if span_delays else "-"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+#!/usr/bin/python3
+
+"""
+Pack recorded frames into a single memory-mappable ``.npy`` stack
+for the `ReplayCamera`.
+
+Usage: pack_frames.py FRAME_DIRECTORY [OUTPUT]
+"""
+
+import sys
+import logging
+
+from hns.replay_camera import pack_frames
+
+logging.basicConfig(level=logging.INFO)
+
+if len(sys.argv) < 2:
+    print(__doc__)
+    sys.exit(1)
+
+output = pack_frames(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+logging.info("Packed frames at: %s", str(output))
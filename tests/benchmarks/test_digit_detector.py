@@ -0,0 +1,22 @@
+"""
+Benchmarks of the DigitDetector on the STOP signals of the track images.
+"""
+
+import pytest
+
+pytest.importorskip("keras")
+
+from hns.digit_detector import DigitDetector  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def digit_detector(config):
+    return DigitDetector.from_config(config["digit-detector"])
+
+
+def test_detect(benchmark, digit_detector, stop_signal_crops):
+    def detect_digits():
+        return [digit_detector.detect(crop) for crop in stop_signal_crops]
+
+    digits = benchmark(detect_digits)
+    assert len(digits) == len(stop_signal_crops)
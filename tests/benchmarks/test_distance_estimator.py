@@ -0,0 +1,61 @@
+"""
+Benchmarks of the StreamingDistanceEstimator on the STOP signals of the track images.
+"""
+
+import numpy as np
+import pytest
+
+from hns.distance_estimator import DistanceEstimator, StreamingDistanceEstimator
+
+
+def crop(height):
+    return np.zeros((height, 20), dtype=np.uint8)
+
+
+def test_predict_and_correct():
+    estimator = DistanceEstimator()
+    streaming = StreamingDistanceEstimator(
+        estimator, mm_per_wheel_cycle=10, measurement_noise=400, odometry_noise=2)
+
+    # the odometry alone doesn't give an estimate
+    assert streaming.update(0) is None
+
+    # the first measurement is taken as it is
+    measured = estimator.estimate(crop(40))
+    estimate = streaming.update(0, crop(40))
+    assert estimate.distance == pytest.approx(measured)
+    assert estimate.variance == pytest.approx(400)
+
+    # the odometry moves the estimate and grows its variance with the travelled distance
+    estimate = streaming.update(1.5)
+    assert estimate.distance == pytest.approx(measured - 15)
+    assert estimate.variance == pytest.approx(400 + 2 * 15)
+
+    # a measurement pulls the estimate towards it by the gain and shrinks the variance
+    measured_closer = estimator.estimate(crop(44))
+    gain = 430 / (430 + 400)
+    estimate = streaming.update(1.5, crop(44))
+    assert estimate.distance == pytest.approx(
+        measured - 15 + gain * (measured_closer - (measured - 15)))
+    assert estimate.variance == pytest.approx(430 * (1 - gain))
+
+    # driving backwards grows the variance as well
+    assert streaming.update(1).variance == pytest.approx(430 * (1 - gain) + 2 * 5)
+
+    streaming.reset()
+    assert streaming.estimate is None
+
+
+def test_streaming_estimate(benchmark, config, stop_signal_crops):
+    def estimate_distances():
+        streaming = StreamingDistanceEstimator.from_config(
+            DistanceEstimator(), config["distance-estimator"])
+        return [
+            streaming.update(index * 0.1, crop_image)
+            for index, crop_image in enumerate(stop_signal_crops)
+        ]
+
+    estimates = benchmark(estimate_distances)
+    # every measurement makes the estimate more certain than a single crop
+    variances = [estimate.variance for estimate in estimates]
+    assert variances[-1] < config["distance-estimator"].getfloat("measurement_noise")
@@ -0,0 +1,50 @@
+"""
+Allocation regression tests of the SignalDetector on the track images.
+"""
+
+import tracemalloc
+
+import pytest
+
+from hns.memory import allocation_peak
+from hns.models import SignalType
+
+#: Holds the number of track frames to replay
+FRAMES = 300
+#: Holds the budget of the mean allocation peak per frame in bytes,
+#: a single gray image of a half frame is ~30 kB
+ALLOCATIONS_PER_FRAME = 16 * 1024
+#: Holds the budget of the memory retained after all frames in bytes
+RETAINED_ALLOCATIONS = 16 * 1024
+
+
+@pytest.mark.parametrize("signal_type", [SignalType.INFO_SIGNAL, SignalType.STOP_SIGNAL])
+def test_allocations_per_frame(benchmark, signal_detector, track_frames, signal_type):
+    frames = track_frames[:FRAMES]
+
+    def detect_signals():
+        return [
+            signal_detector.crop_and_detect(frame, signal_types=[signal_type])
+            for frame in frames
+        ]
+
+    # allocates the buffers, too
+    benchmark(detect_signals)
+
+    tracemalloc.start()
+    try:
+        peaks = [
+            allocation_peak(
+                signal_detector.crop_and_detect, frame, signal_types=[signal_type])[1]
+            for frame in frames
+        ]
+        tracemalloc.clear_traces()
+        for frame in frames:
+            signal_detector.crop_and_detect(frame, signal_types=[signal_type])
+        retained = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    assert sum(peaks) / len(peaks) < ALLOCATIONS_PER_FRAME
+    # nothing is kept from frame to frame, the buffers are allocated only once
+    assert retained < RETAINED_ALLOCATIONS
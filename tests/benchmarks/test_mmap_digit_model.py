@@ -0,0 +1,29 @@
+"""
+Benchmarks of the DigitDetector on memory-mapped weights on the STOP signals of the track images.
+"""
+
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("h5py")
+
+import hns  # noqa: E402
+from hns.digit_detector import DigitDetector  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def digit_detector(config, tmp_path_factory):
+    model_path = Path(hns.__file__).parent / config["digit-detector"]["model"]
+    weights_path = tmp_path_factory.mktemp("weights") / "numbers.weights"
+    return DigitDetector(model_path, backend="mmap", weights_path=weights_path)
+
+
+def test_detect_mmap(benchmark, digit_detector, stop_signal_crops):
+    def detect_digits():
+        return [digit_detector.detect(crop) for crop in stop_signal_crops]
+
+    digits = benchmark(detect_digits)
+    assert len(digits) == len(stop_signal_crops)
+    # the approaches to the STOP signals show digits
+    assert any(digit is not None for digit in digits)
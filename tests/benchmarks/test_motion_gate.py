@@ -0,0 +1,28 @@
+"""
+Benchmarks of the MotionGate on the track images.
+"""
+
+from hns.motion_gate import MotionGate
+from hns.replay import count_laps
+
+
+def test_motion_gate(benchmark, config, upper_track_frames):
+    def gate_frames():
+        motion_gate = MotionGate.from_config(config["motion-gate"])
+        return [motion_gate.should_process(frame) for frame in upper_track_frames]
+
+    processed = benchmark(gate_frames)
+    # at standstill the threshold is the highest, so the most frames are skipped
+    assert sum(processed) < len(upper_track_frames)
+
+
+def test_motion_gate_misses_no_laps(config, signal_detector, upper_track_frames):
+    motion_gate = MotionGate.from_config(config["motion-gate"])
+    rows = []
+    for index, frame in enumerate(upper_track_frames):
+        start_signal = False
+        if motion_gate.should_process(frame):
+            start_signal = signal_detector._find_startsignal(frame)[0]
+        rows.append({"frame": index, "start_signal": start_signal})
+
+    assert count_laps(rows) == 3
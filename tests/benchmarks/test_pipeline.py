@@ -0,0 +1,83 @@
+"""
+Benchmarks of pipelines detecting the START signals on the track images.
+"""
+
+import time
+from pathlib import Path
+
+from hns import metrics
+from hns.frame_scheduler import FrameScheduler
+from hns.models import Frame, SignalType
+from hns.pipeline import Pipeline, Stage
+
+#: Holds the config file the worker processes create their steps from
+CONFIG_FILE = Path(__file__).parent / "../../configs/stable.ini"
+
+
+def run_pipeline(pipeline, frames):
+    pipeline.start()
+    try:
+        for seq, image in enumerate(frames):
+            pipeline.put(Frame(seq, 0.0, image))
+        pipeline.drain()
+    finally:
+        pipeline.stop()
+
+
+def test_thread_stage(benchmark, config, track_frames):
+    def detect_start_signals():
+        detected = []
+        pipeline = Pipeline("test", [
+            Stage("test.crop", ["crop-upper"], config),
+            Stage("test.start", ["start-signal"], config, executor="thread", workers=2,
+                  queue_size=8),
+        ], detected.append)
+        run_pipeline(pipeline, track_frames)
+        return detected
+
+    detected = benchmark(detect_start_signals)
+    # nothing is dropped with the default drop policy, which blocks
+    assert len(detected) == 18
+
+
+def test_process_stage_dropping_oldest(benchmark, config, upper_track_frames):
+    detected = []
+    pipeline = Pipeline("test", [
+        Stage("test.process", ["start-signal"], config, CONFIG_FILE,
+              executor="process", workers=1, queue_size=1, drop="oldest"),
+    ], detected.append)
+    dropped_before = metrics.registry.counters.get("Pipeline::test.process dropped items", 0)
+
+    benchmark.pedantic(run_pipeline, (pipeline, upper_track_frames), rounds=1)
+    # the frames are passed faster than a single worker detects, the oldest are dropped
+    dropped = metrics.registry.counters["Pipeline::test.process dropped items"] - dropped_before
+    assert dropped > 0
+    assert len(detected) + dropped <= len(upper_track_frames)
+    assert all(item["signal"] == SignalType.START_SIGNAL for item in detected)
+
+
+def test_info_pipeline_drops_stale_frames(config, track_frames):
+    detected = []
+    pipeline = Pipeline("info", [
+        Stage("info.crop", ["crop-upper"], config),
+        Stage("info.detection", ["info-signal"], config, executor="thread", queue_size=8),
+    ], detected.append, scheduler=FrameScheduler({"info": 60.0}))
+    metrics.registry.reset()
+
+    pipeline.start()
+    try:
+        for seq, image in enumerate(track_frames):
+            # every other frame is older than the budget of the INFO phase
+            timestamp = time.time() - (120.0 if seq % 2 else 0.0)
+            pipeline.put(Frame(seq, timestamp, image))
+        pipeline.drain()
+    finally:
+        pipeline.stop()
+
+    # like the INFO signal workers, stale frames are dropped before the detection
+    stale = len(track_frames) // 2
+    assert metrics.registry.counters["FrameScheduler::info dropped frames"] == stale
+    assert all(item["seq"] % 2 == 0 for item in detected)
+    # and the age of every other frame is recorded once it's decided on
+    ages = metrics.registry.histograms["FrameScheduler::info frame age at decision"]
+    assert ages.count == len(track_frames) - stale
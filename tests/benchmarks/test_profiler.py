@@ -0,0 +1,27 @@
+"""
+Benchmark of a single sample of the SamplingProfiler, its overhead per sample.
+"""
+
+import threading
+
+from hns.profiler import SamplingProfiler
+
+
+def test_sample(benchmark, tmp_path):
+    profiler = SamplingProfiler(tmp_path)
+    stop_event = threading.Event()
+    waiting_thread = threading.Thread(target=stop_event.wait, name="waiting")
+    waiting_thread.start()
+    try:
+        # sampled from the main thread instead of the profiler thread, so it's skipped
+        benchmark(profiler.sample)
+    finally:
+        stop_event.set()
+        waiting_thread.join()
+
+    assert any(
+        stack.startswith("MainProcess;waiting;") and stack.endswith("threading.py:wait")
+        for stack in profiler.stacks)
+    assert not any(";MainThread;" in stack for stack in profiler.stacks)
+    profiler.write()
+    assert profiler.path.exists()
@@ -0,0 +1,106 @@
+"""
+Benchmarks of the SignalDetector stages on the track images.
+
+Every benchmark processes the whole track image set per round.
+"""
+
+import configparser
+
+import cv2
+import pytest
+
+from hns.models import SignalType
+from hns.signal_detector import SignalDetector
+
+
+@pytest.fixture
+def components_signal_detector(config):
+    components_config = configparser.ConfigParser()
+    components_config.read_dict({"signal-detector": dict(config["signal-detector"])})
+    components_config["signal-detector"]["candidate_engine"] = "components"
+    return SignalDetector.from_config(components_config["signal-detector"])
+
+
+def test_find_startsignal(benchmark, signal_detector, upper_track_frames):
+    def find_startsignals():
+        return sum(signal_detector._find_startsignal(frame)[0] for frame in upper_track_frames)
+
+    found = benchmark(find_startsignals)
+    # the start signal is passed 3 times during the recorded run
+    assert found == 18
+
+
+def test_prepare_image(benchmark, signal_detector, lower_track_frames):
+    def prepare_images():
+        return [signal_detector._prepare_image(frame) for frame in lower_track_frames]
+
+    prepared = benchmark(prepare_images)
+    assert len(prepared) == len(lower_track_frames)
+
+
+def test_get_contours(benchmark, signal_detector, lower_track_frames):
+    # the prepared images are buffers reused for the next frame
+    edge_images = [
+        signal_detector._prepare_image(frame)[0].copy() for frame in lower_track_frames]
+
+    def get_contours():
+        # findContours modifies its input with OpenCV 3
+        return [signal_detector._get_contours(image.copy()) for image in edge_images]
+
+    contours = benchmark(get_contours)
+    assert len(contours) == len(lower_track_frames)
+
+
+def test_find_number_on_signal(benchmark, signal_detector, lower_track_frames):
+    candidates = []
+    for frame in lower_track_frames:
+        edge_image, gray_image = signal_detector._prepare_image(frame)
+        candidates.append(
+            (edge_image, signal_detector._get_contours(edge_image), gray_image.copy()))
+
+    def find_numbers():
+        return sum(
+            signal_detector._find_number_on_signal(*candidate) is not None
+            for candidate in candidates
+        )
+
+    found = benchmark(find_numbers)
+    assert found == 162
+
+
+def test_get_components(benchmark, components_signal_detector, lower_track_frames):
+    gray_images = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in lower_track_frames]
+
+    def get_components():
+        return [components_signal_detector._get_components(image) for image in gray_images]
+
+    components = benchmark(get_components)
+    assert len(components) == len(lower_track_frames)
+
+
+def test_crop_and_detect(benchmark, signal_detector, track_frames):
+    signal_types = [SignalType.STOP_SIGNAL]
+
+    def crop_and_detect():
+        return sum(
+            signal_detector.crop_and_detect(frame, signal_types=signal_types) is not None
+            for frame in track_frames
+        )
+
+    found = benchmark(crop_and_detect)
+    assert found == 162
+
+
+def test_crop_and_detect_components(benchmark, components_signal_detector, track_frames):
+    signal_types = [SignalType.STOP_SIGNAL]
+
+    def crop_and_detect():
+        return sum(
+            components_signal_detector.crop_and_detect(
+                frame, signal_types=signal_types) is not None
+            for frame in track_frames
+        )
+
+    found = benchmark(crop_and_detect)
+    # more candidates than the contours pass the garbage check, the digit detector decides
+    assert found == 216
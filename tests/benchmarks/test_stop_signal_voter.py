@@ -0,0 +1,44 @@
+"""
+Tests of the StopSignalVoter deciding when to stop at the STOP signal.
+"""
+
+import numpy as np
+
+from hns.stop_signal_voter import StopSignalVoter
+
+
+def probabilities(digit, confidence=1.0):
+    result = np.full(10, (1 - confidence) / 9)
+    result[digit] = confidence
+    return result
+
+
+def test_k_of_n_window():
+    voter = StopSignalVoter(2, window=3, threshold=2, hard=True)
+
+    # the votes of frames older than the window are forgotten
+    assert not voter.update(probabilities(2))
+    assert not voter.update(None)
+    assert not voter.update(probabilities(5))
+    assert not voter.update(probabilities(2))
+    # 2 of the last 3 frames vote for the target
+    assert voter.update(probabilities(2))
+
+    voter.reset()
+    assert not voter.update(probabilities(2))
+
+
+def test_hard_votes_follow_the_arg_max():
+    voter = StopSignalVoter(2, window=1, threshold=1, hard=True)
+
+    # an uncertain arg max is a full vote, a confident other digit none
+    assert voter.update(probabilities(2, confidence=0.3))
+    assert not voter.update(probabilities(7, confidence=0.6))
+
+
+def test_soft_votes_accumulate_the_confidence():
+    voter = StopSignalVoter(2, window=2, threshold=1.5)
+
+    assert not voter.update(probabilities(2, confidence=0.7))
+    assert not voter.update(probabilities(2, confidence=0.7))
+    assert voter.update(probabilities(2, confidence=0.8))
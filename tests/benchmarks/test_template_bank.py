@@ -0,0 +1,72 @@
+"""
+Benchmarks of the START signal template bank on the track images.
+"""
+
+import shutil
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+import hns
+from hns.signal_detector import SignalDetector
+from hns.template_bank import HIST_SIZE, TemplateBank, hs_histogram
+
+
+@pytest.fixture
+def template_path(config, tmp_path):
+    template = Path(hns.__file__).parent / config["signal-detector"]["startsignal_templates"]
+    return Path(shutil.copy(str(template), str(tmp_path / template.name)))
+
+
+def test_bank_cache(template_path, tmp_path):
+    cache_path = tmp_path / "startsignal.bank"
+    bank = TemplateBank.from_files([template_path], (0.8, 1.0), cache_path=cache_path)
+    assert cache_path.exists()
+
+    cached_bank = TemplateBank.from_files([template_path], (0.8, 1.0), cache_path=cache_path)
+    assert cached_bank.names == bank.names
+    assert np.array_equal(cached_bank.histograms, bank.histograms)
+
+    # another scale or a changed template invalidates the cache
+    assert len(TemplateBank.from_files([template_path], (1.0,), cache_path=cache_path)) == 1
+    cv2.imwrite(str(template_path), 255 - cv2.imread(str(template_path)))
+    changed_bank = TemplateBank.from_files([template_path], (1.0,), cache_path=cache_path)
+    assert not np.array_equal(changed_bank.histograms, bank.histograms[1:])
+
+
+def test_distances_like_compare_hist(template_path, upper_track_frames):
+    bank = TemplateBank.from_files([template_path])
+    template_hist = bank.histograms[0].reshape(HIST_SIZE)
+    windows = [
+        cv2.cvtColor(np.ascontiguousarray(frame[y:y + 30, x:x + 30]), cv2.COLOR_BGR2HSV)
+        for frame in upper_track_frames[::50] for y in range(0, 120, 40) for x in (60, 120)
+    ]
+    histograms = [hs_histogram(window) for window in windows]
+
+    distances = bank.distances([histogram.ravel() for histogram in histograms], 30)
+    expected = [
+        cv2.compareHist(template_hist, histogram, cv2.HISTCMP_BHATTACHARYYA)
+        for histogram in histograms
+    ]
+    assert np.allclose(distances, expected)
+
+
+def test_find_startsignal_bank(benchmark, config, template_path, upper_track_frames):
+    # the template and its mirror image at three scales
+    mirrored_path = template_path.with_name("mirrored.jpg")
+    cv2.imwrite(str(mirrored_path), cv2.flip(cv2.imread(str(template_path)), 1))
+    bank = TemplateBank.from_files([template_path, mirrored_path], (0.8, 1.0, 1.2))
+    section = config["signal-detector"]
+    signal_detector = SignalDetector(
+        section.getint("canny_threshold1"), section.getint("canny_threshold2"),
+        section.getint("canny_aperture_size"), section.getint("minimum_box_size"),
+        bank, section.getfloat("startsignal_match_confidence"))
+
+    def find_startsignals():
+        return sum(signal_detector._find_startsignal(frame)[0] for frame in upper_track_frames)
+
+    found = benchmark(find_startsignals)
+    # more templates match at least the START signals of the single template
+    assert found >= 18
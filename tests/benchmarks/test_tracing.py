@@ -0,0 +1,32 @@
+"""
+Benchmarks of the spans of the tracing, disabled and enabled.
+"""
+
+from hns import tracing
+
+
+def trace_frames():
+    for seq in range(100):
+        with tracing.span("Test::capture", seq, capture=True):
+            pass
+        with tracing.span("Test::detection", seq):
+            pass
+
+
+def test_span_disabled(benchmark):
+    benchmark(trace_frames)
+
+
+def test_span_enabled(benchmark, tmp_path):
+    tracing.start_tracing(tmp_path)
+    try:
+        # every round records events, keep the trace small
+        benchmark.pedantic(trace_frames, rounds=50)
+    finally:
+        tracing.stop_tracing()
+
+    trace = tracing.merge_traces(tmp_path)
+    spans = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    flows = [event for event in trace["traceEvents"] if event["ph"] in ("s", "t")]
+    assert spans and len(spans) == len(flows)
+    assert {event["args"]["seq"] for event in spans} == set(range(100))
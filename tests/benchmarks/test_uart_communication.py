@@ -0,0 +1,46 @@
+"""
+Benchmarks of the UART frame encoding and decoding.
+"""
+
+import struct
+import collections
+
+import pytest
+
+from hns.uart_communication import encode_to_frame, pop_frame, decode_frame
+
+#: Holds status payloads, including bytes which need to be escaped
+STATUS_PAYLOADS = [
+    struct.pack("<BbbHB", speed, 0x7C - speed, -3, wheel_cycles, speed & 0x01)
+    for speed, wheel_cycles in zip(range(0, 250, 2), range(0x7D00, 0x7E00, 2))
+]
+
+
+@pytest.fixture
+def status_frames():
+    return [encode_to_frame(payload) for payload in STATUS_PAYLOADS]
+
+
+def test_encode_to_frame(benchmark):
+    frames = benchmark(lambda: [encode_to_frame(payload) for payload in STATUS_PAYLOADS])
+    assert [decode_frame(frame) for frame in frames] == STATUS_PAYLOADS
+
+
+def test_pop_frame(benchmark, status_frames):
+    stream = b"".join(status_frames)
+
+    def pop_frames():
+        read_queue = collections.deque(stream)
+        frames = []
+        frame = pop_frame(read_queue)
+        while len(frame) > 0:
+            frames.append(bytes(frame))
+            frame = pop_frame(read_queue)
+        return frames
+
+    assert benchmark(pop_frames) == status_frames
+
+
+def test_decode_frame(benchmark, status_frames):
+    payloads = benchmark(lambda: [bytes(decode_frame(frame)) for frame in status_frames])
+    assert payloads == STATUS_PAYLOADS
@@ -0,0 +1,66 @@
+"""
+Fixtures shared by the HNS tests.
+"""
+
+import configparser
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from hns.models import SignalType
+from hns.replay_camera import load_frames
+from hns.signal_detector import SignalDetector
+
+#: Holds the root directory of the repository
+ROOT_DIR = Path(__file__).parent / ".."
+
+#: Holds the directory of the recorded frames of a track run
+TRACK_IMAGES_DIR = Path(__file__).parent / "images" / "track"
+
+
+@pytest.fixture(scope="session")
+def config():
+    """The stable config, without applying its logging configuration."""
+    config = configparser.ConfigParser()
+    config.read(str(ROOT_DIR / "configs/stable.ini"))
+    return config
+
+
+@pytest.fixture(scope="session")
+def track_frames():
+    """All frames of the track run, loaded into memory."""
+    return np.array(load_frames(TRACK_IMAGES_DIR))
+
+
+@pytest.fixture
+def signal_detector(config):
+    return SignalDetector.from_config(config["signal-detector"])
+
+
+@pytest.fixture(scope="session")
+def upper_track_frames(track_frames):
+    """The upper half of the track frames, where START and INFO signals are."""
+    return [
+        np.ascontiguousarray(frame[:frame.shape[0] // 2, :]) for frame in track_frames
+    ]
+
+
+@pytest.fixture(scope="session")
+def lower_track_frames(track_frames):
+    """The lower half of the track frames, where STOP signals are."""
+    return [
+        np.ascontiguousarray(frame[frame.shape[0] // 2:, :]) for frame in track_frames
+    ]
+
+
+@pytest.fixture(scope="session")
+def stop_signal_crops(config, track_frames):
+    """The cropped STOP signals found on the track frames."""
+    signal_detector = SignalDetector.from_config(config["signal-detector"])
+    crops = []
+    for frame in track_frames:
+        signal = signal_detector.crop_and_detect(frame, signal_types=[SignalType.STOP_SIGNAL])
+        if signal is not None:
+            crops.append(signal.image)
+    return crops